@@ -0,0 +1,36 @@
+"""user roles unique user role
+
+Revision ID: 5e7a3c9d2b18
+Revises: 9d3b6e1f0a42
+Create Date: 2026-10-18 16:42:13.550921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e7a3c9d2b18'
+down_revision: Union[str, None] = '9d3b6e1f0a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # same role assigned twice to a user, keep one row
+    op.execute("""
+        DELETE FROM user_roles duplicate
+        USING user_roles kept
+        WHERE duplicate.user_id = kept.user_id
+          AND duplicate.role_id = kept.role_id
+          AND duplicate.id > kept.id
+    """)
+    op.create_unique_constraint('uq_user_roles_user_id_role_id', 'user_roles', ['user_id', 'role_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_user_roles_user_id_role_id', 'user_roles', type_='unique')
@@ -0,0 +1,45 @@
+"""user hierarchy missing rows
+
+Revision ID: 7e4611164a07
+Revises: f2a0099d4fda
+Create Date: 2026-10-18 18:47:58.170647
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4611164a07'
+down_revision: Union[str, None] = 'f2a0099d4fda'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # users created outside the repositories (setup-user.py) got no closure rows, not even the one to themselves,
+    # so cycle checks missed them. Their chain up the reports_to tree is added, existing rows are kept
+    op.execute("""
+        WITH RECURSIVE chain(descendant_id, ancestor_id, next_id, depth) AS (
+            SELECT id, id, reports_to, 0 FROM users u
+            WHERE NOT EXISTS (
+                SELECT 1 FROM user_hierarchy h WHERE h.ancestor_id = u.id AND h.descendant_id = u.id
+            )
+            UNION ALL
+            SELECT chain.descendant_id, users.id, users.reports_to, chain.depth + 1
+            FROM chain JOIN users ON users.id = chain.next_id
+            WHERE chain.depth < 64
+        )
+        INSERT INTO user_hierarchy (ancestor_id, descendant_id, depth)
+        SELECT DISTINCT ON (ancestor_id, descendant_id) ancestor_id, descendant_id, depth FROM chain
+        ORDER BY ancestor_id, descendant_id, depth
+        ON CONFLICT (ancestor_id, descendant_id) DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    pass
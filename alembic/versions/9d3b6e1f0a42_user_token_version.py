@@ -0,0 +1,28 @@
+"""user token version
+
+Revision ID: 9d3b6e1f0a42
+Revises: e4a9c2f17b05
+Create Date: 2026-10-18 14:05:41.207113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3b6e1f0a42'
+down_revision: Union[str, None] = 'e4a9c2f17b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,35 @@
+"""user search trigram indexes
+
+Revision ID: d4c8e2a71f90
+Revises: b81f4d2e6c39
+Create Date: 2026-10-18 18:12:45.106284
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4c8e2a71f90'
+down_revision: Union[str, None] = 'b81f4d2e6c39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pg_trgm ships with postgres contrib (available on RDS/Cloud SQL). GIN trigram indexes serve LIKE '%term%'.
+    # Expressions must stay same as in UserRepository.search_users for the planner to use them
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX ix_users_full_name_trgm ON users USING gin (lower(firstname || ' ' || lastname) gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_users_email_trgm ON users USING gin (lower(email) gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_users_phone_trgm ON users USING gin (lower(phone) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_phone_trgm', table_name='users')
+    op.drop_index('ix_users_email_trgm', table_name='users')
+    op.drop_index('ix_users_full_name_trgm', table_name='users')
@@ -0,0 +1,37 @@
+"""permission bits
+
+Revision ID: e4a9c2f17b05
+Revises: 2b8f0d6c41e7
+Create Date: 2026-10-18 12:20:05.318876
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c2f17b05'
+down_revision: Union[str, None] = '2b8f0d6c41e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('permissions', sa.Column('bit', sa.Integer(), nullable=True))
+    # give existing permissions bits in name order
+    op.execute("""
+        UPDATE permissions SET bit = numbered.position
+        FROM (SELECT id, row_number() OVER (ORDER BY name) - 1 AS position FROM permissions) AS numbered
+        WHERE permissions.id = numbered.id
+    """)
+    op.alter_column('permissions', 'bit', nullable=False)
+    op.create_unique_constraint(None, 'permissions', ['bit'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('permissions_bit_key', 'permissions', type_='unique')
+    op.drop_column('permissions', 'bit')
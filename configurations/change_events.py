@@ -0,0 +1,125 @@
+import asyncio
+import inspect
+import json
+import os
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List
+
+import psycopg
+from dotenv import load_dotenv
+from sqlalchemy import select, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from configurations.database import DATABASE_URL
+
+load_dotenv()
+
+CHANGE_EVENTS_CHANNEL = os.getenv("CHANGE_EVENTS_CHANNEL", "hr_change_events")
+#seconds to wait before connecting again when listener connection is lost
+CHANGE_EVENTS_RECONNECT_SECONDS = float(os.getenv("CHANGE_EVENTS_RECONNECT_SECONDS", "2"))
+#items (user ids, with a value at most) per notification of publish_chunked, keeps payload well under 8000 bytes
+#limit of pg_notify
+CHANGE_EVENTS_CHUNK_SIZE = 100
+
+
+class ChangeEventBus:
+    """
+    Keeps per worker in-memory state (caches, token versions) in sync across workers using postgres LISTEN/NOTIFY.
+    Events are published inside the caller's transaction, so listeners only see them once it commits.
+    Every worker (including the publishing one) receives the event on its own listener connection.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._handlers: Dict[str, List[Callable]] = defaultdict(list)
+        self._connect_handlers: List[Callable[[], Awaitable]] = []
+        self._task = None
+        self.received = 0
+        self.reconnects = 0
+
+    def subscribe(self, event: str, handler: Callable):
+        # handler(payload: dict), can be sync or async
+        self._handlers[event].append(handler)
+
+    def on_connect(self, handler: Callable[[], Awaitable]):
+        # async handler run every time listener connects. Events sent while disconnected are lost, so it reloads state
+        self._connect_handlers.append(handler)
+
+    async def publish(self, db: AsyncSession, event: str, payload: dict):
+        # pg_notify is transactional, nothing is sent if caller rolls back. Payload must stay under 8000 bytes
+        await db.execute(select(func.pg_notify(self.channel, json.dumps({"event": event, "payload": payload}))))
+
+    async def publish_chunked(self, db: AsyncSession, event: str, items: list, build_payload: Callable[[list], dict]):
+        # one event per CHANGE_EVENTS_CHUNK_SIZE items, for events naming many users
+        for start in range(0, len(items), CHANGE_EVENTS_CHUNK_SIZE):
+            await self.publish(db, event, build_payload(items[start:start + CHANGE_EVENTS_CHUNK_SIZE]))
+
+    async def start(self):
+        # first connect is awaited so state is loaded before app starts serving
+        connection = await self._connect()
+        self._task = asyncio.create_task(self._listen(connection))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _connect(self):
+        # dedicated connection outside the pool, LISTEN needs a session that stays open
+        url = make_url(DATABASE_URL).set(drivername="postgresql")
+        connection = await psycopg.AsyncConnection.connect(url.render_as_string(hide_password=False), autocommit=True)
+        await connection.execute(f'LISTEN "{self.channel}"')
+        for handler in self._connect_handlers:
+            await handler()
+        return connection
+
+    async def _listen(self, connection):
+        while True:
+            try:
+                async for notify in connection.notifies():
+                    self.received += 1
+                    await self._dispatch(notify.payload)
+            except asyncio.CancelledError:
+                await connection.close()
+                raise
+            except Exception as e:
+                print(f"Change event listener lost connection: {e}")
+                await connection.close()
+                connection = await self._reconnect()
+
+    async def _reconnect(self):
+        while True:
+            await asyncio.sleep(CHANGE_EVENTS_RECONNECT_SECONDS)
+            try:
+                connection = await self._connect()
+                self.reconnects += 1
+                return connection
+            except Exception as e:
+                print(f"Change event listener reconnect failed: {e}")
+
+    async def _dispatch(self, raw_payload: str):
+        message = json.loads(raw_payload)
+        for handler in self._handlers.get(message.get("event"), []):
+            try:
+                result = handler(message.get("payload") or {})
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                # one failing handler must not stop the listener
+                print(f"Change event handler failed for {message.get('event')}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "channel": self.channel,
+            "listening": self._task is not None and not self._task.done(),
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+
+change_event_bus = ChangeEventBus(CHANGE_EVENTS_CHANNEL)
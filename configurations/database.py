@@ -1,17 +1,41 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from dotenv import load_dotenv
 import os
 
+from configurations.pool_metrics import InstrumentedAsyncAdaptedQueuePool
+
 load_dotenv()
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-#create engine
-engine = create_engine(DATABASE_URL, echo=True)
+#engine profile. Pool limits are per worker, so total connections = workers * (pool size + max overflow)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+engine_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "echo": DB_ECHO,
+}
+
+#create engine. Sync engine is kept for scripts (setup, alembic), the app itself uses the async engine
+engine = create_engine(DATABASE_URL, **engine_options)
+async_engine = create_async_engine(DATABASE_URL, poolclass=InstrumentedAsyncAdaptedQueuePool, **engine_options)
 
 #initiate session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+#expire_on_commit is disabled because expired attributes can't be lazy loaded again in async session
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
 #base class for model
 class Base(DeclarativeBase):
@@ -25,3 +49,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+#async dependency for db connection. Used by all the routes so db round trips don't block event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,83 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select, func
+
+from configurations.database import AsyncSessionLocal
+from repositories.attendance.attendance_repository import AttendanceRepository
+
+load_dotenv()
+
+#seconds between runs, a day is closed at most this long after local midnight of its users
+DAY_CLOSE_INTERVAL_SECONDS = float(os.getenv("DAY_CLOSE_INTERVAL_SECONDS", "300"))
+DAY_CLOSE_LOCK_ID = 7_210_415_002
+
+
+class DayCloseJob:
+    """
+    Closes days users didn't end with /timelog/day-end: open logs of earlier local days and their summaries.
+    Started in every worker, each run takes a transaction level advisory lock so only one worker does the work
+    and others skip that run.
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._task = None
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_result: Optional[dict] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # a failed run is retried on next interval
+                self.failures += 1
+                print(f"Day close job failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> Optional[dict]:
+        async with AsyncSessionLocal() as db:
+            # lock is released by commit/rollback of the run
+            if not await db.scalar(select(func.pg_try_advisory_xact_lock(DAY_CLOSE_LOCK_ID))):
+                self.skipped += 1
+                return None
+            result = await AttendanceRepository(db).close_past_days()
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        self.last_result = result
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "running": self._task is not None and not self._task.done(),
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+        }
+
+
+day_close_job = DayCloseJob(DAY_CLOSE_INTERVAL_SECONDS)
@@ -1,31 +1,81 @@
-from sqlalchemy.orm import Session
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user_model import Permission
+from models.app_state_model import AppState
 from utilities.permission_utlis import all_registered_permissions
+from utilities.rbac_matrix import publish_rbac_changed
+
+PERMISSIONS_FINGERPRINT_KEY = "permissions_fingerprint"
+#any constant, same for all workers. Advisory lock held by the worker doing the sync
+PERMISSION_SYNC_LOCK_ID = 7_210_415_001
+
+
+def permissions_fingerprint(permissions, delete_orphans: bool) -> str:
+    return hashlib.sha256("\n".join([str(delete_orphans), *sorted(permissions)]).encode()).hexdigest()
+
 
+async def _stored_fingerprint(db: AsyncSession):
+    result = await db.execute(select(AppState.value).where(AppState.key == PERMISSIONS_FINGERPRINT_KEY))
+    return result.scalar_one_or_none()
 
-def sync_permissions_to_db(db: Session, delete_orphans: bool = False):
-    existing_permissions = db.query(Permission.name).all()
-    existing_permission_names = {name for (name,) in existing_permissions}
 
-    new_permissions = [
-        Permission(name=perm_name)
-        for perm_name in all_registered_permissions
-        if perm_name not in existing_permission_names
-    ]
+async def sync_permissions_to_db(db: AsyncSession, delete_orphans: bool = False):
+    """
+    Runs in every worker on startup. When stored fingerprint matches the registered permissions it costs a single
+    primary key read. Otherwise one worker syncs under an advisory lock, the others wait and then skip.
+    Delete app_state row with key permissions_fingerprint to force a sync.
+    """
+    fingerprint = permissions_fingerprint(all_registered_permissions, delete_orphans)
+    if await _stored_fingerprint(db) == fingerprint:
+        return
 
     try:
+        # released on commit/rollback. Fingerprint is read again as another worker may have synced while we waited
+        await db.execute(select(func.pg_advisory_xact_lock(PERMISSION_SYNC_LOCK_ID)))
+        if await _stored_fingerprint(db) == fingerprint:
+            await db.commit()
+            return
+
+        result = await db.execute(select(Permission.name, Permission.bit))
+        existing_permissions = dict(result.all())
+        existing_permission_names = set(existing_permissions)
+
+        # new permissions get next free bits, bits of existing permissions never change
+        next_bit = max(existing_permissions.values(), default=-1) + 1
+        new_permissions = [
+            Permission(name=perm_name, bit=next_bit + index)
+            for index, perm_name in enumerate(sorted(all_registered_permissions - existing_permission_names))
+        ]
+        changed = bool(new_permissions)
+
         if new_permissions:
-            db.bulk_save_objects(new_permissions)
-            db.commit()
+            db.add_all(new_permissions)
             print(f"Inserted {len(new_permissions)} new permissions")
 
         if delete_orphans:
             orphaned_permissions = existing_permission_names - set(all_registered_permissions)
             if orphaned_permissions:
-                db.query(Permission).filter(Permission.name.in_(orphaned_permissions)).delete(synchronize_session=False)
-                db.commit()
+                await db.execute(delete(Permission).where(Permission.name.in_(orphaned_permissions)))
+                changed = True
                 print(f"Deleted {len(orphaned_permissions)} orphaned permissions")
 
+        await db.execute(
+            pg_insert(AppState)
+            .values(key=PERMISSIONS_FINGERPRINT_KEY, value=fingerprint, updated_at=datetime.utcnow())
+            .on_conflict_do_update(
+                index_elements=[AppState.key],
+                set_={"value": fingerprint, "updated_at": datetime.utcnow()}
+            )
+        )
+        if changed:
+            # other workers learn bits of new permissions
+            await publish_rbac_changed(db)
+        await db.commit()
+
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error syncing permissions: {e}")
@@ -1,25 +1,37 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from sqlalchemy.orm import Session
 from configurations.startup_task import sync_permissions_to_db
+from utilities.permission_utlis import compile_route_permissions
 from routers.departments import department_routes
 from routers.users import role_routes, users_routes, permissions_routes
 from routers.attendance import attendance_routes
 from routers import auth_routes
+from routers.internal import monitoring_routes
 from routers.leaves import leaves_route
-from configurations.database import SessionLocal
+from configurations.database import AsyncSessionLocal, async_engine
+from configurations.change_events import change_event_bus
+from configurations.day_close_job import day_close_job
+from utilities.password_hashing import password_hasher
 
 
 # Define lifespan function
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Application Starting Up")
-    db = SessionLocal()
-    sync_permissions_to_db(db)
-    db.close()
+    async with AsyncSessionLocal() as db:
+        await sync_permissions_to_db(db)
+        await compile_route_permissions(db, app.routes)
+    # listens for change events of other workers, loads token versions on connect
+    await change_event_bus.start()
+    # closes days users didn't end, one worker per run
+    await day_close_job.start()
     yield
     print("Application is shutting down...")
+    await day_close_job.stop()
+    await change_event_bus.stop()
+    await async_engine.dispose()
+    password_hasher.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -42,4 +54,5 @@ app.include_router(role_routes.router)
 app.include_router(permissions_routes.router)
 app.include_router(users_routes.router)
 app.include_router(attendance_routes.router)
-app.include_router(leaves_route.router)
\ No newline at end of file
+app.include_router(leaves_route.router)
+app.include_router(monitoring_routes.router)
\ No newline at end of file
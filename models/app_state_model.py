@@ -0,0 +1,13 @@
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from configurations.database import Base
+
+
+class AppState(Base):
+    #small key value store for app bookkeeping shared by all workers (e.g. fingerprint of synced permissions)
+    __tablename__ = "app_state"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[str] = mapped_column(String, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
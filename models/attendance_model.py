@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, Table, DateTime, Date
+from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, Table, DateTime, Date, Index, text, \
+    UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 import uuid
@@ -9,6 +10,10 @@ from configurations.database import Base
 
 class TimeLog(Base):
     __tablename__ = "time_log"
+    #a user has at most one open log, punch in relies on it for ON CONFLICT
+    __table_args__ = (
+        Index("uq_time_log_open_user_id", "user_id", unique=True, postgresql_where=text("punch_out_time IS NULL")),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
@@ -19,6 +24,12 @@ class TimeLog(Base):
 
 class TimeSummary(Base):
     __tablename__ = "time_summary"
+    #one running summary per user and local day, punch-out adds to it with ON CONFLICT.
+    #open summaries are few, day close job finds them by the partial index instead of scanning history
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", name="uq_time_summary_user_id_date"),
+        Index("ix_time_summary_open_date", "date", postgresql_where=text("NOT is_closed")),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
@@ -28,4 +39,24 @@ class TimeSummary(Base):
     min_seconds: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Duration in seconds
     day_start_time: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     day_end_time: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    #set by day end, summary is open (user still working or on break) until then
+    is_closed: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="false")
 
+
+
+PRESENCE_PUNCHED_IN = "PUNCHED_IN"
+PRESENCE_ON_BREAK = "ON_BREAK"
+PRESENCE_DAY_ENDED = "DAY_ENDED"
+
+
+class UserPresence(Base):
+    __tablename__ = "user_presence"
+    #current attendance state, one row per user written in the same transaction as punch in/out and day end.
+    #date is user's local date of the change, state of an earlier date means user hasn't started today
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    state: Mapped[str] = mapped_column(String(20), nullable=False)
+    date: Mapped[Date] = mapped_column(Date, nullable=False)
+    changed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
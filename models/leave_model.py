@@ -43,7 +43,7 @@ class LeaveRequests(Base):
     __tablename__ = "leave_requests"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True)
     leave_type: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("leave_type.id", ondelete="CASCADE"))
     application_date: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.now(timezone.utc))
     leave_from: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, Table, DateTime
+from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, Table, DateTime, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 import uuid
@@ -26,8 +26,10 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column(String, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     timezone: Mapped[Optional[str]] = mapped_column(String, default="Asia/Kolkata")
+    #embedded in tokens as "ver", bumped when roles/permissions/department/status change to reject older tokens
+    token_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     department_id: Mapped[Optional[uuid.UUID]] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("departments.id", ondelete="SET NULL", use_alter=True), nullable=True
+        UUID(as_uuid=True), ForeignKey("departments.id", ondelete="SET NULL", use_alter=True), nullable=True, index=True
     )
     reports_to: Mapped[Optional[uuid.UUID]] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True
@@ -58,9 +60,11 @@ class Role(Base):
 
 class UserRole(Base):
     __tablename__ = "user_roles"
+    #a role is assigned to a user once, bulk assignment relies on it for ON CONFLICT
+    __table_args__ = (UniqueConstraint("user_id", "role_id", name="uq_user_roles_user_id_role_id"),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True)
     role_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("roles.id", ondelete="CASCADE"))
 
     user: Mapped["User"] = relationship("User", back_populates="roles")
@@ -71,6 +75,7 @@ class Permission(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    bit: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)  # position in token permission mask
 
     roles: Mapped[List["Role"]] = relationship("Role", secondary=role_permissions, back_populates="permissions")
 
@@ -88,3 +93,16 @@ class Department(Base):
                                                back_populates="department")
     head_user: Mapped[Optional["User"]] = relationship("User", foreign_keys=[department_head],
                                                        back_populates="headed_department")
+
+class UserHierarchy(Base):
+    # closure table of reports_to tree. Each user has a row to itself with depth 0,
+    # and a row for every direct and indirect manager with depth = levels between them
+    __tablename__ = "user_hierarchy"
+
+    ancestor_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    descendant_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+    depth: Mapped[int] = mapped_column(Integer, nullable=False)
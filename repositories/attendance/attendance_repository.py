@@ -1,111 +1,251 @@
+import os
 import uuid
 from datetime import datetime, date
 from typing import Optional, Any, Type, List
 
-from sqlalchemy import Date, cast, exists
-from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from sqlalchemy import Date, DateTime, Integer, cast, exists, select, update, literal, false, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.functions import now, func
-from sqlalchemy.sql.operators import and_
 
-from models.attendance_model import TimeLog, TimeSummary
-from schemas.attendance_schema import TimeLogRead, TimeSummaryRead, TimeLogCreate, TimeSummaryCreate
+from models.attendance_model import TimeLog, TimeSummary, UserPresence, PRESENCE_PUNCHED_IN, PRESENCE_ON_BREAK, \
+    PRESENCE_DAY_ENDED
+from models.user_model import User
+from schemas.attendance_schema import TimeLogRead, TimeSummaryRead, TimeLogCreate
+from utilities.time_utils import local_date
+
+
+load_dotenv()
+
+MIN_WORK_SECONDS_PER_DAY = int(os.getenv("MIN_WORK_HOURS_PER_DAY") or "8") * 60 * 60
+
+ONE_DAY = text("interval '1 day'")
+
+TIME_LOG_COLUMNS = (TimeLog.id, TimeLog.user_id, TimeLog.punch_in_time, TimeLog.punch_out_time, TimeLog.duration)
+TIME_SUMMARY_COLUMNS = (
+    TimeSummary.id, TimeSummary.user_id, TimeSummary.date, TimeSummary.overtime_seconds, TimeSummary.actual_seconds,
+    TimeSummary.min_seconds, TimeSummary.day_start_time, TimeSummary.day_end_time, TimeSummary.is_closed
+)
+
+
+def user_local_today():
+    # summaries are keyed by user's local date, so "today" differs per user
+    return cast(func.timezone(func.coalesce(User.timezone, "UTC"), func.now()), Date)
+
+
+def add_to_existing_summary(insert_summary):
+    # summary insert becomes an update of the day's running totals when the day already has a summary
+    excluded = insert_summary.excluded
+    actual_seconds = func.coalesce(TimeSummary.actual_seconds, 0) + excluded.actual_seconds
+    return insert_summary.on_conflict_do_update(
+        constraint="uq_time_summary_user_id_date",
+        set_={
+            "actual_seconds": actual_seconds,
+            "overtime_seconds": func.greatest(
+                actual_seconds - func.coalesce(TimeSummary.min_seconds, excluded.min_seconds), 0
+            ),
+            "day_start_time": func.least(TimeSummary.day_start_time, excluded.day_start_time),
+            "day_end_time": func.greatest(TimeSummary.day_end_time, excluded.day_end_time),
+        }
+    )
 
 
 class AttendanceRepository:
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def check_if_time_log_exists(self, user_id: uuid.UUID) -> Optional[Type[TimeLog]]:
-        existing_log = self.db.query(TimeLog).filter(
-            TimeLog.user_id == user_id,
-            TimeLog.punch_out_time.is_(None)
-        ).order_by(TimeLog.punch_in_time.desc()).first()
-        return existing_log or None
-
-    def create_time_log(self, time_log_data: TimeLogCreate) -> TimeLogRead:
-        new_time_log = TimeLog(**time_log_data.dict())
-        self.db.add(new_time_log)
-        self.db.commit()
-        self.db.refresh(new_time_log)
-        return TimeLogRead(
-            id=new_time_log.id,
-            user_id=new_time_log.user_id,
-            punch_in_time=new_time_log.punch_in_time,
-            punch_out_time=new_time_log.punch_out_time,
-            duration=new_time_log.duration
+    async def open_time_log(self, time_log_data: TimeLogCreate, timezone: str) -> Optional[TimeLogRead]:
+        """
+        Punch in with one INSERT. None when user already has an open log, the partial unique index on open logs
+        makes concurrent punch-ins of same user create only one.
+        """
+        result = await self.db.execute(
+            pg_insert(TimeLog)
+            .values(id=uuid.uuid4(), **time_log_data.model_dump())
+            .on_conflict_do_nothing(index_elements=[TimeLog.user_id], index_where=TimeLog.punch_out_time.is_(None))
+            .returning(*TIME_LOG_COLUMNS)
         )
-
-    def get_time_logs_for_date(self, user_id: str, target_date: date):
-        start = datetime.combine(target_date, datetime.min.time())
-        end = datetime.combine(target_date, datetime.max.time())
-
-        return self.db.query(TimeLog).filter(
-            TimeLog.user_id == user_id,
-            TimeLog.punch_in_time >= start,
-            TimeLog.punch_in_time <= end
-        ).all()
-
-    def create_time_summary(self, time_summary_data: TimeSummaryCreate) -> TimeSummaryRead:
-        new_time_summary = TimeSummary(**time_summary_data.dict())
-        self.db.add(new_time_summary)
-        self.db.commit()
-        self.db.refresh(new_time_summary)
-        return TimeSummaryRead(
-            id=new_time_summary.id,
-            user_id=new_time_summary.user_id,
-            date=new_time_summary.date,
-            overtime_seconds=new_time_summary.overtime_seconds,
-            actual_seconds=new_time_summary.actual_seconds,
-            min_seconds=new_time_summary.min_seconds,
-            day_start_time=new_time_summary.day_start_time,
-            day_end_time=new_time_summary.day_end_time
+        row = result.mappings().first()
+        if row is None:
+            await self.db.rollback()
+            return None
+        time_log = TimeLogRead(**row)
+        await self._set_presence(time_log.user_id, PRESENCE_PUNCHED_IN, time_log.punch_in_time, timezone)
+        await self.db.commit()
+        return time_log
+
+    async def close_open_time_log(self, user_id, punch_out_time: datetime, timezone: str) -> Optional[TimeLogRead]:
+        # punch out, None when user has no open log
+        time_log = await self._close_open_time_log(user_id, punch_out_time, timezone)
+        if time_log is not None:
+            await self._set_presence(user_id, PRESENCE_ON_BREAK, punch_out_time, timezone)
+        await self.db.commit()
+        return time_log
+
+    async def _set_presence(self, user_id, state: str, changed_at: datetime, timezone: str):
+        # one row per user, overwritten in the transaction of the punch that changed it
+        await self.db.execute(
+            pg_insert(UserPresence)
+            .values(user_id=user_id, state=state, date=local_date(changed_at, timezone), changed_at=changed_at)
+            .on_conflict_do_update(
+                index_elements=[UserPresence.user_id],
+                set_={"state": state, "date": local_date(changed_at, timezone), "changed_at": changed_at}
+            )
         )
 
-    def check_summary_exists_for_date(self, user_id: str, target_date: date) -> bool:
-        start = datetime.combine(target_date, datetime.min.time())
-        end = datetime.combine(target_date, datetime.max.time())
-
-        time_summary = self.db.query(TimeSummary).filter(
-            TimeSummary.user_id == user_id,
-            TimeSummary.date >= start,
-            TimeSummary.date <= end
-        ).first()
-
-        return time_summary is not None
-
-    def get_time_logs_for_range(self, user_id: str, start: datetime, end: datetime):
-        return self.db.query(TimeLog).filter(
-            TimeLog.user_id == user_id,
-            TimeLog.punch_in_time >= start,
-            TimeLog.punch_in_time <= end
-        ).all()
-
-    def get_open_time_logs(self, start: datetime, end: datetime):
-        return self.db.query(TimeLog).filter(
-            TimeLog.punch_in_time >= start,
-            TimeLog.punch_in_time <= end,
-            TimeLog.punch_out_time.is_(None)
-        ).all()
-
-    def get_users_on_break(self):
-        return (
-            self.db.query(TimeLog.user_id)
-            .outerjoin(
-                TimeSummary,
-                and_(
-                    TimeLog.user_id == TimeSummary.user_id,
-                    TimeSummary.date == date.today()
-                )
+    async def _close_open_time_log(self, user_id, punch_out_time: datetime, timezone: str) -> Optional[TimeLogRead]:
+        """Close open log with one UPDATE and add its duration to the summary of local day it started on"""
+        result = await self.db.execute(
+            update(TimeLog)
+            .where(TimeLog.user_id == user_id, TimeLog.punch_out_time.is_(None))
+            .values(
+                punch_out_time=punch_out_time,
+                duration=cast(func.extract("epoch", literal(punch_out_time, DateTime) - TimeLog.punch_in_time), Integer)
             )
-            .filter(
-                TimeLog.punch_out_time.isnot(None),
-                TimeSummary.user_id.is_(None)
+            .returning(*TIME_LOG_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.mappings().first()
+        if row is None:
+            return None
+        time_log = TimeLogRead(**row)
+        await self._add_to_time_summary(time_log, timezone)
+        return time_log
+
+    async def _add_to_time_summary(self, time_log: TimeLogRead, timezone: str):
+        # running aggregate of the day, concurrent punch-outs of same user can't lose an update
+        insert_summary = pg_insert(TimeSummary).values(
+            id=uuid.uuid4(),
+            user_id=time_log.user_id,
+            date=local_date(time_log.punch_in_time, timezone),
+            actual_seconds=time_log.duration,
+            min_seconds=MIN_WORK_SECONDS_PER_DAY,
+            overtime_seconds=max(0, time_log.duration - MIN_WORK_SECONDS_PER_DAY),
+            day_start_time=time_log.punch_in_time,
+            day_end_time=time_log.punch_out_time,
+            is_closed=False
+        )
+        await self.db.execute(add_to_existing_summary(insert_summary))
+
+    async def end_day(self, user_id, now: datetime, timezone: str) -> Optional[TimeSummaryRead]:
+        """
+        Close open log and the summary it was added to (local day of its punch in) in one transaction, without an
+        open log the summary of current local day is closed. None when there is nothing to close (no punches,
+        or day already ended), nothing is changed then.
+        """
+        time_log = await self._close_open_time_log(user_id, now, timezone)
+        query = update(TimeSummary).where(TimeSummary.user_id == user_id)
+        if time_log is not None:
+            query = query.where(TimeSummary.date == local_date(time_log.punch_in_time, timezone))
+        else:
+            query = query.where(TimeSummary.date == local_date(now, timezone), ~TimeSummary.is_closed)
+        result = await self.db.execute(
+            query
+            .values(is_closed=True)
+            .returning(*TIME_SUMMARY_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.mappings().first()
+        if row is None:
+            return None
+        await self._set_presence(user_id, PRESENCE_DAY_ENDED, now, timezone)
+        await self.db.commit()
+        return TimeSummaryRead(**row)
+
+    async def close_past_days(self) -> dict:
+        """
+        Day end for everyone who didn't do it, in set based statements over all users (grouped by their timezone
+        in sql, not per user). Logs still open from an earlier local day are closed at the local midnight
+        following their punch in and added to that day's summary, then every summary of an earlier local day is closed
+        and presence left from an earlier day is set to day ended.
+        """
+        timezone = func.coalesce(User.timezone, "UTC")
+        local_punch_in = func.timezone(timezone, func.timezone("UTC", TimeLog.punch_in_time))
+        local_day = cast(local_punch_in, Date)
+        # next local midnight as naive utc
+        midnight = func.timezone("UTC", func.timezone(timezone, func.date_trunc("day", local_punch_in) + ONE_DAY))
+
+        closed_logs = (
+            update(TimeLog)
+            .where(TimeLog.user_id == User.id, TimeLog.punch_out_time.is_(None), local_day < user_local_today())
+            .values(
+                punch_out_time=midnight,
+                duration=cast(func.extract("epoch", midnight - TimeLog.punch_in_time), Integer)
             )
-            .group_by(TimeLog.user_id)
-            .all()
+            .returning(TimeLog.user_id, local_day.label("date"), TimeLog.duration, TimeLog.punch_in_time,
+                       TimeLog.punch_out_time)
+            .cte("closed_logs")
         )
+        actual_seconds = func.sum(closed_logs.c.duration)
+        result = await self.db.execute(
+            add_to_existing_summary(
+                pg_insert(TimeSummary).from_select(
+                    ["id", "user_id", "date", "actual_seconds", "min_seconds", "overtime_seconds",
+                     "day_start_time", "day_end_time", "is_closed"],
+                    select(
+                        func.gen_random_uuid(), closed_logs.c.user_id, closed_logs.c.date, actual_seconds,
+                        literal(MIN_WORK_SECONDS_PER_DAY), func.greatest(actual_seconds - MIN_WORK_SECONDS_PER_DAY, 0),
+                        func.min(closed_logs.c.punch_in_time), func.max(closed_logs.c.punch_out_time), false()
+                    )
+                    .group_by(closed_logs.c.user_id, closed_logs.c.date)
+                )
+            ).returning(TimeSummary.id)
+        )
+        summaries_updated = len(result.all())
 
-    def get_users_has_day_ended(self):
-        today = date.today()
-        return self.db.query(TimeSummary).filter(TimeSummary.date == today).all()
+        result = await self.db.execute(
+            update(TimeSummary)
+            .where(TimeSummary.user_id == User.id, ~TimeSummary.is_closed, TimeSummary.date < user_local_today())
+            .values(is_closed=True)
+            .execution_options(synchronize_session=False)
+        )
+        summaries_closed = result.rowcount
+
+        # presence of users whose day was closed here, they are no longer punched in/on break
+        result = await self.db.execute(
+            update(UserPresence)
+            .where(UserPresence.user_id == User.id, UserPresence.state != PRESENCE_DAY_ENDED,
+                   UserPresence.date < user_local_today())
+            .values(state=PRESENCE_DAY_ENDED, changed_at=func.timezone("UTC", func.now()))
+            .execution_options(synchronize_session=False)
+        )
+        presence_ended = result.rowcount
+        await self.db.commit()
+        return {"summaries_updated": summaries_updated, "summaries_closed": summaries_closed,
+                "presence_ended": presence_ended}
+
+    async def get_time_summary(self, user_id, target_date: date) -> Optional[TimeSummaryRead]:
+        # single row by (user_id, date) key
+        result = await self.db.execute(
+            select(*TIME_SUMMARY_COLUMNS).where(TimeSummary.user_id == user_id, TimeSummary.date == target_date)
+        )
+        row = result.mappings().first()
+        return TimeSummaryRead(**row) if row else None
+
+    async def get_time_logs_for_range(self, user_id: str, start: datetime, end: datetime):
+        result = await self.db.execute(
+            select(TimeLog).where(
+                TimeLog.user_id == user_id,
+                TimeLog.punch_in_time >= start,
+                TimeLog.punch_in_time <= end
+            )
+        )
+        return result.scalars().all()
+
+    async def get_presence(self, user_ids=None):
+        """
+        (user_id, state, changed_at) of users whose state changed on their local today.
+        user_ids is optional list or select of user ids to limit the result to (e.g. accessible users)
+        """
+        query = (
+            select(UserPresence.user_id, UserPresence.state, UserPresence.changed_at)
+            .join(User, User.id == UserPresence.user_id)
+            .where(UserPresence.date == user_local_today())
+            .order_by(UserPresence.changed_at)
+        )
+        if user_ids is not None:
+            query = query.where(UserPresence.user_id.in_(user_ids))
+        result = await self.db.execute(query)
+        return result.all()
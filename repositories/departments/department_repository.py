@@ -1,43 +1,68 @@
 import uuid
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from schemas.department_schema import DepartmentCreate, DepartmentUpdate
-from models.user_model import Department
+from models.user_model import Department, User
+from utilities.access_profile_cache import invalidate_access_profile
+from utilities.token_versions import bump_token_versions
+from utilities.user_directory import publish_users_changed
 
 
 class DepartmentRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_department(self, department_data: DepartmentCreate):
+    async def create_department(self, department_data: DepartmentCreate):
         new_department = Department(
             department_name=department_data.department_name.casefold(), #department is stored in lower case only
             department_head=department_data.department_head
         )
         self.db.add(new_department)
-        self.db.commit()
-        self.db.refresh(new_department)
+        await self.db.commit()
+        await self.db.refresh(new_department)
         return new_department
 
-    def get_all_departments(self) -> list:
-        return self.db.query(Department).all()
+    async def get_all_departments(self) -> list:
+        result = await self.db.execute(select(Department))
+        return result.scalars().all()
 
-    def delete_department(self, name: str) -> bool:
-        department = self.db.query(Department).filter(Department.department_name == name.casefold()).first()
+    async def delete_department(self, name: str) -> bool:
+        #users are loaded upfront as orm need them to set department to null and async session can't lazy load
+        result = await self.db.execute(
+            select(Department)
+            .options(selectinload(Department.users))
+            .where(Department.department_name == name.casefold())
+        )
+        department = result.scalars().first()
         if department is None:
             return False
 
-        self.db.delete(department)
-        self.db.commit()
+        # department name is part of access token of its users
+        user_ids = [user.id for user in department.users]
+        await bump_token_versions(self.db, user_ids)
+        await self.db.delete(department)
+        await publish_users_changed(self.db, user_ids)
+        await self.db.commit()
+        # department of all its users is cleared
+        invalidate_access_profile()
         return True
 
-    def update_department(self, department_data: DepartmentUpdate):
-        department = self.db.query(Department).filter(
-            Department.id == department_data.id
-        ).first()
+    async def update_department(self, department_data: DepartmentUpdate):
+        result = await self.db.execute(
+            select(Department).where(Department.id == department_data.id)
+        )
+        department = result.scalars().first()
         if department is None:
             return False
         department.department_name = department_data.department_name
         department.department_head = department_data.department_head
-        self.db.commit()
-        return True
\ No newline at end of file
+        result = await self.db.execute(select(User.id).where(User.department_id == department.id))
+        user_ids = result.scalars().all()
+        await bump_token_versions(self.db, user_ids)
+        # department name is shown with its users, only their directory entries are refreshed
+        await publish_users_changed(self.db, user_ids)
+        await self.db.commit()
+        invalidate_access_profile()
+        return True
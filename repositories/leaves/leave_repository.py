@@ -3,45 +3,54 @@ import uuid
 from typing import Optional, List
 
 from fastapi import HTTPException
-from sqlalchemy import and_, select
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import and_, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from schemas.leave_schema import LeaveRequestCreate, LeaveRequestOut, LeaveApprovalUpdate, LeaveStatusEnum, \
-    LeaveBalanceResponse, PaginatedLeaveRequestsResponse, LeaveTypeResponse
+    LeaveBalanceResponse, PaginatedLeaveRequestsResponse, LeaveTypeResponse, LeaveRequestsListResponse, UserInfo, \
+    LeaveTypeInfo
 from models.user_model import User
 from models.leave_model import LeaveRequests, LeaveType, LeaveBalance
+from utilities.user_directory import user_directory
 
 
 class LeaveRepository:
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def check_overlapping_leave(self, request: LeaveRequestCreate) -> bool:
+    async def check_overlapping_leave(self, request: LeaveRequestCreate) -> bool:
         # Check for overlapping leave requests
-        overlapping = self.db.query(LeaveRequests).filter(
-            LeaveRequests.user_id == request.user_id,
-            LeaveRequests.leave_from <= request.leave_to,
-            LeaveRequests.leave_to >= request.leave_from
-        ).first()
+        result = await self.db.execute(
+            select(LeaveRequests).where(
+                LeaveRequests.user_id == request.user_id,
+                LeaveRequests.leave_from <= request.leave_to,
+                LeaveRequests.leave_to >= request.leave_from
+            ).limit(1)
+        )
+        overlapping = result.scalars().first()
         if overlapping:
             return True
         return False
 
-    def get_leave_balance(self, request: LeaveRequestCreate, year, quarter):
-        leave_balance = self.db.query(LeaveBalance).filter_by(
-            user_id=request.user_id,
-            leave_type=request.leave_type,
-            year=year,
-            quarter=quarter
-        ).first()
+    async def get_leave_balance(self, request: LeaveRequestCreate, year, quarter):
+        result = await self.db.execute(
+            select(LeaveBalance).filter_by(
+                user_id=request.user_id,
+                leave_type=request.leave_type,
+                year=year,
+                quarter=quarter
+            )
+        )
+        leave_balance = result.scalars().first()
 
         return leave_balance
 
-    def create_leave_request(self, request):
+    async def create_leave_request(self, request):
         leave_request = LeaveRequests(**request.dict())
         self.db.add(leave_request)
-        self.db.commit()
-        self.db.refresh(leave_request)
+        await self.db.commit()
+        await self.db.refresh(leave_request)
 
         return LeaveRequestOut(
             id=leave_request.id,
@@ -57,13 +66,14 @@ class LeaveRepository:
             approver_comments=leave_request.approver_comments
         )
 
-    def process_leave_update(
+    async def process_leave_update(
             self,
             user_id: uuid.UUID,
             request: LeaveApprovalUpdate,
             approver_id: uuid.UUID
     )-> tuple[LeaveRequests, str]:
-        leave_req = self.db.query(LeaveRequests).filter(LeaveRequests.id == request.leave_id).first()
+        result = await self.db.execute(select(LeaveRequests).where(LeaveRequests.id == request.leave_id))
+        leave_req = result.scalars().first()
 
         if not leave_req:
             raise HTTPException(status_code=404, detail="Leave record doesn't exist")
@@ -81,13 +91,13 @@ class LeaveRepository:
         leave_req.approver_comments = request.comments
         leave_req.approver_id = approver_id
 
-        self.db.commit()
-        self.db.refresh(leave_req)
+        await self.db.commit()
+        await self.db.refresh(leave_req)
 
         # Return both current and original status
         return [leave_req, original_status]
 
-    def update_leave_balance(
+    async def update_leave_balance(
             self,
             leave,
             original_status: str,
@@ -96,7 +106,7 @@ class LeaveRepository:
             days: int
     ) -> bool:
         try:
-            leave_balance = self.get_leave_balance(leave, year, current_quarter)
+            leave_balance = await self.get_leave_balance(leave, year, current_quarter)
             days = int(days)
 
             if leave.leave_status == LeaveStatusEnum.approved:
@@ -115,94 +125,118 @@ class LeaveRepository:
                     leave_balance.leave_available += days
                     leave_balance.leave_requested -= days
 
-            self.db.commit()
+            await self.db.commit()
             return True
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Something went wrong: {str(e)}")
 
-    def get_user_leave_balance(self, user_id: uuid.UUID, year: int, quarter: int, leave_type: Optional[uuid.UUID] = None):
-        query =  self.db.query(LeaveBalance).options(
-            joinedload(LeaveBalance.leave_type_obj),
-            joinedload(LeaveBalance.user)
-        ).filter(
+    async def get_user_leave_balance(self, user_id: uuid.UUID, year: int, quarter: int, leave_type: Optional[uuid.UUID] = None):
+        query = select(LeaveBalance).options(
+            joinedload(LeaveBalance.leave_type_obj)
+        ).where(
             LeaveBalance.user_id == user_id,
             LeaveBalance.year == year,
             LeaveBalance.quarter == quarter,
         )
 
         if leave_type:
-            query = query.filter(LeaveBalance.leave_type == leave_type)
+            query = query.where(LeaveBalance.leave_type == leave_type)
 
-        leave_balances = query.all()
+        result = await self.db.execute(query)
+        leave_balances = result.scalars().all()
+        users = await user_directory.get_many({lb.user_id for lb in leave_balances}, self.db)
 
         return [
             LeaveBalanceResponse(
                 leave_type=lb.leave_type_obj.title,
                 user_id=lb.user_id,
-                user_name=f"{lb.user.firstname} {lb.user.lastname}",
+                user_name=users[lb.user_id].display_name,
                 leave_available=lb.leave_available,
                 leave_taken=lb.leave_taken,
                 leave_requested=lb.leave_requested,
             )
-            for lb in leave_balances
+            # user deleted meanwhile, its balances go with it
+            for lb in leave_balances if lb.user_id in users
         ]
 
-    def get_leave_requests(self, user_id: uuid.UUID, from_date: datetime, to_date: datetime):
+    async def get_leave_requests(self, user_id: uuid.UUID, from_date: datetime, to_date: datetime):
 
-        leave_requests = (
-            self.db.query(LeaveRequests)
-            .options(joinedload(LeaveRequests.user), joinedload(LeaveRequests.leave_type_obj))
-            .filter(
+        result = await self.db.execute(
+            select(LeaveRequests)
+            .options(joinedload(LeaveRequests.leave_type_obj))
+            .where(
                 LeaveRequests.leave_from >= from_date,
                 LeaveRequests.leave_to <= to_date,
                 LeaveRequests.user_id == user_id
             )
-            .all()
         )
+        leave_requests = result.scalars().all()
 
-        return leave_requests
+        return await self._to_list_items(leave_requests)
 
-    def get_all_leave_requests(self, accessible_user_ids, from_date, to_date, leave_status, leave_type, limit, page):
+    async def get_all_leave_requests(self, accessible_user_ids, from_date, to_date, leave_status, leave_type, limit, page):
+        # accessible_user_ids can be list of ids or select of ids (see get_accessible_users.accessible_user_ids_query)
 
-        query = self.db.query(LeaveRequests).filter(
+        query = select(LeaveRequests).where(
             LeaveRequests.user_id.in_(accessible_user_ids)
         )
 
         if from_date:
-            query = query.filter(LeaveRequests.leave_from >= datetime.datetime.combine(from_date, datetime.datetime.min.time()))
+            query = query.where(LeaveRequests.leave_from >= datetime.datetime.combine(from_date, datetime.datetime.min.time()))
         if to_date:
-            query = query.filter(LeaveRequests.leave_to <= datetime.datetime.combine(to_date, datetime.datetime.max.time()))
+            query = query.where(LeaveRequests.leave_to <= datetime.datetime.combine(to_date, datetime.datetime.max.time()))
         if leave_status:
-            query = query.filter(LeaveRequests.leave_status == leave_status)
+            query = query.where(LeaveRequests.leave_status == leave_status)
         if leave_type:
-            query = query.filter(LeaveRequests.leave_type == leave_type)
+            query = query.where(LeaveRequests.leave_type == leave_type)
 
-        # Eager loading (optional optimization)
-        query = query.options(
-            selectinload(LeaveRequests.user),
-            selectinload(LeaveRequests.leave_type_obj)
-        )
+        total = await self.db.scalar(select(func.count()).select_from(query.subquery()))
+
+        # users are rendered from in-memory directory, only leave types are loaded
+        query = query.options(selectinload(LeaveRequests.leave_type_obj))
 
-        total = query.count()
-        leave_requests = query.order_by(LeaveRequests.application_date.desc()).offset((page - 1) * limit).limit(
-            limit).all()
+        result = await self.db.execute(
+            query.order_by(LeaveRequests.application_date.desc()).offset((page - 1) * limit).limit(limit)
+        )
+        leave_requests = result.scalars().all()
 
         return PaginatedLeaveRequestsResponse(
             total_records=total,
             page=page,
             limit=limit,
-            results=leave_requests  # Pydantic will auto-convert with `from_attributes=True`
+            results=await self._to_list_items(leave_requests)
         )
 
-    def get_leave_types(self) -> List[LeaveTypeResponse]:
-        results = self.db.query(LeaveType).all()
+    async def _to_list_items(self, leave_requests) -> List[LeaveRequestsListResponse]:
+        users = await user_directory.get_many({lr.user_id for lr in leave_requests}, self.db)
+        return [
+            LeaveRequestsListResponse(
+                id=lr.id,
+                user=UserInfo(id=lr.user_id, firstname=users[lr.user_id].firstname, lastname=users[lr.user_id].lastname),
+                leave_type_obj=LeaveTypeInfo.model_validate(lr.leave_type_obj),
+                application_date=lr.application_date,
+                leave_from=lr.leave_from,
+                leave_to=lr.leave_to,
+                leave_reason=lr.leave_reason,
+                leave_status=lr.leave_status,
+                approved_date=lr.approved_date,
+                approver_comments=lr.approver_comments,
+                approver_id=lr.approver_id
+            )
+            # user deleted meanwhile, its requests go with it
+            for lr in leave_requests if lr.user_id in users
+        ]
+
+    async def get_leave_types(self) -> List[LeaveTypeResponse]:
+        result = await self.db.execute(select(LeaveType))
+        results = result.scalars().all()
         ##model_validate() is the correct way to convert ORM models into Pydantic models when using from_attributes=True.
         return [LeaveTypeResponse.model_validate(lt) for lt in results]
 
-    def create_leave_balance(self, payload):
+    async def create_leave_balance(self, payload):
 
-        result =  self.db.execute(
+        result = await self.db.execute(
             select(LeaveBalance).where(
                 LeaveBalance.user_id == payload.user_id,
                 LeaveBalance.leave_type == payload.leave_type,
@@ -232,10 +266,10 @@ class LeaveRepository:
         self.db.add(new_balance)
 
         try:
-            self.db.commit()
-            self.db.refresh(new_balance)
+            await self.db.commit()
+            await self.db.refresh(new_balance)
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             raise HTTPException(
                 400,
                 detail="Integrity error: possibly duplicate entry."
@@ -243,8 +277,9 @@ class LeaveRepository:
 
         return new_balance
 
-    def create_leave_type(self, payload):
-        leave_type = self.db.query(LeaveType).filter(LeaveType.title == payload.title).first()
+    async def create_leave_type(self, payload):
+        result = await self.db.execute(select(LeaveType).where(LeaveType.title == payload.title))
+        leave_type = result.scalars().first()
 
         if leave_type:
             raise HTTPException(400, "Leave type already exists")
@@ -255,5 +290,5 @@ class LeaveRepository:
         )
 
         self.db.add(leave_type_records)
-        self.db.commit()
+        await self.db.commit()
         return leave_type_records
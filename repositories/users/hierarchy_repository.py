@@ -0,0 +1,91 @@
+import uuid
+from typing import Optional, Iterable
+
+from sqlalchemy import select, delete, insert, literal, union, any_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from models.user_model import User, UserHierarchy
+from utilities.sql_utils import uuid_array
+
+#guard for recursive walk in case reports_to data already has a cycle
+MAX_HIERARCHY_DEPTH = 64
+#serializes reports_to changes with their rebuilds, overlapping rebuilds would delete and insert the same rows
+HIERARCHY_LOCK_ID = 7_210_415_003
+
+
+class HierarchyRepository:
+    """Maintains user_hierarchy closure table. Methods don't commit, they run in the caller's transaction."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def lock(self) -> None:
+        """
+        Transaction level lock for changes of the reporting tree, held until caller commits/rolls back.
+        Callers take it before reading or locking users they are going to move, so the cycle check, the reports_to
+        update and the rebuild see the tree other transactions left. Taking it again in same transaction is a no-op.
+        """
+        await self.db.execute(select(func.pg_advisory_xact_lock(HIERARCHY_LOCK_ID)))
+
+    async def rebuild(self, root_ids: Optional[Iterable[uuid.UUID]] = None) -> None:
+        """
+        Recompute closure rows for given users and everyone below them. Used after a user is created,
+        moved to another manager or deleted. Without root_ids whole table is rebuilt.
+        """
+        await self.lock()
+        start = select(User.id, User.reports_to)
+        if root_ids is None:
+            await self.db.execute(delete(UserHierarchy))
+        else:
+            root_ids = list(root_ids)
+            if not root_ids:
+                return
+            # subtree below the roots doesn't change when a root moves, so existing rows give the affected users.
+            # They are fetched first as the rows are deleted before being inserted again
+            result = await self.db.execute(
+                union(
+                    select(UserHierarchy.descendant_id).where(UserHierarchy.ancestor_id == any_(uuid_array(root_ids))),
+                    select(User.id).where(User.id == any_(uuid_array(root_ids)))
+                )
+            )
+            affected_ids = uuid_array(result.scalars().all())
+            await self.db.execute(delete(UserHierarchy).where(UserHierarchy.descendant_id == any_(affected_ids)))
+            start = start.where(User.id == any_(affected_ids))
+
+        # walk up reports_to from every affected user, one row per (manager, user)
+        start = start.subquery()
+        chain = (
+            select(
+                start.c.id.label("descendant_id"),
+                start.c.id.label("ancestor_id"),
+                start.c.reports_to.label("next_id"),
+                literal(0).label("depth"),
+            )
+            .cte("chain", recursive=True)
+        )
+        manager = aliased(User)
+        chain = chain.union_all(
+            select(chain.c.descendant_id, manager.id, manager.reports_to, chain.c.depth + 1)
+            .where(manager.id == chain.c.next_id, chain.c.depth < MAX_HIERARCHY_DEPTH)
+        )
+
+        await self.db.execute(
+            insert(UserHierarchy).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(chain.c.ancestor_id, chain.c.descendant_id, chain.c.depth)
+            )
+        )
+
+    async def is_in_subtree(self, root_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        # True when user_id is root_id itself or reports to it directly or indirectly
+        result = await self.db.execute(
+            select(UserHierarchy.depth).where(
+                UserHierarchy.ancestor_id == root_id,
+                UserHierarchy.descendant_id == user_id
+            )
+        )
+        return result.first() is not None
+
+    async def get_direct_reports(self, user_id: uuid.UUID) -> list[uuid.UUID]:
+        result = await self.db.execute(select(User.id).where(User.reports_to == user_id))
+        return list(result.scalars().all())
@@ -1,17 +1,27 @@
 import uuid
+from typing import Optional
 
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from schemas.users_schema import RoleCreate, RoleUpdate, RolePermissionAssign
-from models.user_model import Role, Permission
+
+from sqlalchemy import select, delete, func, literal, any_, not_
+from sqlalchemy.dialects.postgresql import insert as pg_insert, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from schemas.users_schema import RoleCreate, RoleUpdate, RolePermissionAssign, BulkRoleUsers, BulkRoleUsersResponse
+from models.user_model import Role, Permission, User, UserRole, role_permissions
+from utilities.access_profile_cache import invalidate_access_profile
+from utilities.rbac_matrix import publish_rbac_changed
+from utilities.sql_utils import uuid_array
+from utilities.token_versions import bump_token_versions
 
 
 class RoleRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_role(self, role: RoleCreate):
-        existing_role = self.db.query(Role).filter(Role.name == role.name).first()
+    async def create_role(self, role: RoleCreate):
+        result = await self.db.execute(select(Role).where(Role.name == role.name))
+        existing_role = result.scalars().first()
         if existing_role:
             raise HTTPException(status_code=400, detail="Role already exists")
         new_role = Role(
@@ -20,46 +30,182 @@ class RoleRepository:
             can_cross_departments=role.can_cross_departments,
         )
         self.db.add(new_role)
-        self.db.commit()
-        self.db.refresh(new_role)
+        await publish_rbac_changed(self.db)
+        await self.db.commit()
+        await self.db.refresh(new_role)
         return new_role
 
-    def get_all_roles(self) -> list:
-        return self.db.query(Role).all()
+    async def get_all_roles(self) -> list:
+        result = await self.db.execute(select(Role))
+        return result.scalars().all()
 
-    def delete_role(self, name: str):
-        role = self.db.query(Role).filter(Role.name == name.casefold()).first()
+    async def delete_role(self, name: str):
+        #user roles are loaded upfront for delete cascade as async session can't lazy load
+        result = await self.db.execute(
+            select(Role).options(selectinload(Role.users)).where(Role.name == name.casefold())
+        )
+        role = result.scalars().first()
         if role:
-            self.db.delete(role)
-            self.db.commit()
+            await self.db.delete(role)
+            # tokens still carry the role id, workers drop it from the matrix
+            await publish_rbac_changed(self.db)
+            await self.db.commit()
+            # hierarchy level of every user with this role can change
+            invalidate_access_profile()
             return role.name
         raise HTTPException(status_code=404, detail="role doesn't exist")
 
-    def update_role(self, role: RoleUpdate):
-        role_data = self.db.query(Role).filter(Role.id == role.id).first()
+    async def update_role(self, role: RoleUpdate):
+        result = await self.db.execute(select(Role).where(Role.id == role.id))
+        role_data = result.scalars().first()
         if role_data is None:
             raise HTTPException(status_code=404, detail="role doesn't exist")
         role_data.name = role.name.casefold()
         role_data.hierarchy_level = role.hierarchy_level
         role_data.can_cross_departments = role.can_cross_departments
-        self.db.commit()
+        # levels of existing tokens come from the matrix, no re-login needed
+        await publish_rbac_changed(self.db)
+        await self.db.commit()
+        invalidate_access_profile()
         return True
 
-    def assign_permissions(self, data: RolePermissionAssign):
-        role = self.db.query(Role).filter(Role.id == data.role_id).first()
+    async def _get_role(self, role_id) -> Role:
+        result = await self.db.execute(select(Role).where(Role.id == role_id))
+        role = result.scalars().first()
         if not role:
             raise HTTPException(status_code=404, detail="Role not found")
+        return role
 
-        # Fetch all permissions by ID
-        permissions = self.db.query(Permission).filter(Permission.id.in_(data.permission_ids)).all()
-        if not permissions or len(permissions) != len(data.permission_ids):
+    async def _validate_permission_ids(self, permission_ids):
+        result = await self.db.execute(
+            select(func.count()).select_from(Permission).where(Permission.id == any_(uuid_array(permission_ids)))
+        )
+        if not permission_ids or result.scalar_one() != len(set(permission_ids)):
             raise HTTPException(status_code=404, detail="One or more permissions not found")
 
-        # Assign (override existing ones if needed)
-        role.permissions = permissions
-        self.db.commit()
+    async def _insert_role_permissions(self, role_id, permission_ids) -> list:
+        result = await self.db.execute(
+            pg_insert(role_permissions)
+            .from_select(
+                ["role_id", "permission_id"],
+                select(literal(role_id, UUID(as_uuid=True)), Permission.id)
+                .where(Permission.id == any_(uuid_array(permission_ids)))
+            )
+            .on_conflict_do_nothing()
+            .returning(role_permissions.c.permission_id)
+        )
+        return result.scalars().all()
+
+    async def assign_permissions(self, data: RolePermissionAssign):
+        role = await self._get_role(data.role_id)
+        await self._validate_permission_ids(data.permission_ids)
+
+        # Assign (override existing ones). Only the difference is written, unchanged rows are left alone
+        removed = await self.db.execute(
+            delete(role_permissions)
+            .where(
+                role_permissions.c.role_id == role.id,
+                not_(role_permissions.c.permission_id == any_(uuid_array(data.permission_ids)))
+            )
+            .returning(role_permissions.c.permission_id)
+        )
+        removed = removed.scalars().all()
+        added = await self._insert_role_permissions(role.id, data.permission_ids)
+        if removed or added:
+            await publish_rbac_changed(self.db)
+        await self.db.commit()
+
+        return {"message": f"Assigned {len(set(data.permission_ids))} permissions to role '{role.name}'",
+                "added": len(added), "removed": len(removed)}
+
+    async def grant_permissions(self, data: RolePermissionAssign):
+        role = await self._get_role(data.role_id)
+        await self._validate_permission_ids(data.permission_ids)
+        added = await self._insert_role_permissions(role.id, data.permission_ids)
+        if added:
+            await publish_rbac_changed(self.db)
+        await self.db.commit()
+        return {"message": f"Granted {len(added)} permissions to role '{role.name}'", "added": len(added)}
+
+    async def revoke_permissions(self, data: RolePermissionAssign):
+        role = await self._get_role(data.role_id)
+        result = await self.db.execute(
+            delete(role_permissions)
+            .where(
+                role_permissions.c.role_id == role.id,
+                role_permissions.c.permission_id == any_(uuid_array(data.permission_ids))
+            )
+            .returning(role_permissions.c.permission_id)
+        )
+        removed = result.scalars().all()
+        if removed:
+            await publish_rbac_changed(self.db)
+        await self.db.commit()
+        return {"message": f"Revoked {len(removed)} permissions from role '{role.name}'", "removed": len(removed)}
+
+    async def _resolve_bulk_users(self, data: BulkRoleUsers, accessible_user_ids) -> tuple[list, list]:
+        # requested users split into those current user can access and the rest (missing or out of scope)
+        requested = list(dict.fromkeys(data.user_ids))
+        query = select(User.id).where(User.id == any_(uuid_array(requested)))
+        if accessible_user_ids is not None:
+            query = query.where(User.id.in_(accessible_user_ids))
+        allowed = set((await self.db.execute(query)).scalars().all())
+        return [user_id for user_id in requested if user_id in allowed], [user_id for user_id in requested if user_id not in allowed]
+
+    async def _after_user_roles_changed(self, user_ids):
+        # role_ids in their tokens and their hierarchy level for access checks are stale
+        await bump_token_versions(self.db, user_ids)
+        await self.db.commit()
+        for user_id in user_ids:
+            invalidate_access_profile(user_id)
+
+    async def bulk_assign_role(self, data: BulkRoleUsers, accessible_user_ids=None,
+                               min_assignable_level: Optional[int] = None) -> BulkRoleUsersResponse:
+        """
+        Give the role to many users with one INSERT ... ON CONFLICT DO NOTHING, users already having it are left alone.
+        min_assignable_level stops current user from handing out roles above their own level (None for god).
+        """
+        role = await self._get_role(data.role_id)
+        if min_assignable_level is not None and role.hierarchy_level < min_assignable_level:
+            raise HTTPException(status_code=403, detail="Can't assign a role higher than your own")
+
+        user_ids, skipped = await self._resolve_bulk_users(data, accessible_user_ids)
+        changed = []
+        if user_ids:
+            result = await self.db.execute(
+                pg_insert(UserRole)
+                .from_select(
+                    ["id", "user_id", "role_id"],
+                    select(func.gen_random_uuid(), User.id, literal(role.id, UUID(as_uuid=True)))
+                    .where(User.id == any_(uuid_array(user_ids)))
+                )
+                .on_conflict_do_nothing(constraint="uq_user_roles_user_id_role_id")
+                .returning(UserRole.user_id)
+            )
+            changed = result.scalars().all()
+        await self._after_user_roles_changed(changed)
+        return BulkRoleUsersResponse(role_id=role.id, requested=len(user_ids) + len(skipped), changed=len(changed),
+                                     skipped_user_ids=skipped)
+
+    async def bulk_remove_role(self, data: BulkRoleUsers, accessible_user_ids=None,
+                               min_assignable_level: Optional[int] = None) -> BulkRoleUsersResponse:
+        role = await self._get_role(data.role_id)
+        if min_assignable_level is not None and role.hierarchy_level < min_assignable_level:
+            raise HTTPException(status_code=403, detail="Can't remove a role higher than your own")
 
-        return {"message": f"Assigned {len(permissions)} permissions to role '{role.name}'"}
+        user_ids, skipped = await self._resolve_bulk_users(data, accessible_user_ids)
+        changed = []
+        if user_ids:
+            result = await self.db.execute(
+                delete(UserRole)
+                .where(UserRole.role_id == role.id, UserRole.user_id == any_(uuid_array(user_ids)))
+                .returning(UserRole.user_id)
+            )
+            changed = result.scalars().all()
+        await self._after_user_roles_changed(changed)
+        return BulkRoleUsersResponse(role_id=role.id, requested=len(user_ids) + len(skipped), changed=len(changed),
+                                     skipped_user_ids=skipped)
 
-    def get_all_permissions(self):
-        return self.db.query(Permission).all()
\ No newline at end of file
+    async def get_all_permissions(self):
+        result = await self.db.execute(select(Permission))
+        return result.scalars().all()
@@ -0,0 +1,227 @@
+import os
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import select, insert, func, or_, any_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user_model import User, UserRole, Department
+from repositories.users.hierarchy_repository import HierarchyRepository
+from schemas.users_schema import UserImportRow, UserImportError, UserImportReport
+from utilities.import_utils import next_import_batch
+from utilities.password_hashing import hash_passwords_async
+from utilities.rbac_matrix import rbac_matrix
+from utilities.sql_utils import uuid_array, string_array
+from utilities.user_directory import publish_users_changed
+
+load_dotenv()
+
+#rows validated, hashed and inserted together, each batch is one transaction
+USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", "500"))
+
+
+class _PendingUser:
+    __slots__ = ("row_number", "data", "id", "role_ids", "errors")
+
+    def __init__(self, row_number: int, data: UserImportRow):
+        self.row_number = row_number
+        self.data = data
+        self.id = uuid.uuid4()
+        self.role_ids: List[uuid.UUID] = []
+        self.errors: List[str] = []
+
+
+class UserImportRepository:
+    """
+    Bulk counterpart of UserRepository.create_user. Rows are consumed in batches, every batch costs a fixed
+    number of queries (existing users, managers, departments, inserts) instead of several per user,
+    and passwords of a batch are hashed in parallel.
+    """
+
+    def __init__(self, db: AsyncSession, min_assignable_level: Optional[int] = None):
+        self.db = db
+        #rows asking for a role above importing user's own level are rejected (None for god)
+        self.min_assignable_level = min_assignable_level
+        # emails/phones seen in earlier rows of the file, duplicates inside the file are rejected
+        self._seen_emails = set()
+        self._seen_phones = set()
+        #email -> id of users created by this import, later rows can report to them
+        self._created = {}
+
+    async def import_users(self, rows: Iterable[Tuple[int, Optional[dict]]]) -> UserImportReport:
+        report = UserImportReport(total=0, created=0, failed=0, errors=[])
+        rows = iter(rows)
+        while batch := await next_import_batch(rows, USER_IMPORT_BATCH_SIZE):
+            report.total += len(batch)
+            created, errors = await self._import_batch(batch)
+            report.created += created
+            report.errors.extend(sorted(errors, key=lambda error: error.row))
+        report.failed = len(report.errors)
+        return report
+
+    async def _import_batch(self, batch: List[Tuple[int, Optional[dict]]]) -> Tuple[int, List[UserImportError]]:
+        errors = []
+        pending = []
+        for row_number, raw_row in batch:
+            if raw_row is None:
+                errors.append(UserImportError(row=row_number, errors=["Row is not a JSON object"]))
+                continue
+            try:
+                data = UserImportRow.model_validate(raw_row)
+            except ValidationError as e:
+                errors.append(UserImportError(
+                    row=row_number,
+                    email=raw_row.get("email") if isinstance(raw_row.get("email"), str) else None,
+                    errors=[f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+                ))
+                continue
+            # same normalisation create_user checks against
+            data.email = data.email.lower()
+            pending.append(_PendingUser(row_number, data))
+
+        self._check_duplicates_in_file(pending)
+        await self._check_existing_users(pending)
+        self._resolve_roles(pending)
+        managers = await self._resolve_managers(pending)
+
+        valid = [user for user in pending if not user.errors]
+        errors.extend(UserImportError(row=user.row_number, email=user.data.email, errors=user.errors)
+                      for user in pending if user.errors)
+        if not valid:
+            return 0, errors
+
+        password_hashes = await hash_passwords_async([user.data.password for user in valid])
+        try:
+            await HierarchyRepository(self.db).lock()
+            departments = await self._get_or_create_departments({user.data.department_name for user in valid})
+            await self.db.execute(insert(User), [
+                {
+                    "id": user.id,
+                    "firstname": user.data.firstname,
+                    "lastname": user.data.lastname,
+                    "email": user.data.email,
+                    "phone": user.data.phone,
+                    "hashed_password": password_hash,
+                    "department_id": departments.get(user.data.department_name),
+                    "reports_to": managers.get(user.row_number),
+                }
+                for user, password_hash in zip(valid, password_hashes)
+            ])
+            await self.db.execute(insert(UserRole), [
+                {"user_id": user.id, "role_id": role_id} for user in valid for role_id in user.role_ids
+            ])
+            await HierarchyRepository(self.db).rebuild([user.id for user in valid])
+            await publish_users_changed(self.db, [user.id for user in valid])
+            await self.db.commit()
+        except IntegrityError:
+            # same email/phone was taken or a manager deleted by someone else meanwhile, whole batch is rolled back
+            await self.db.rollback()
+            for user in valid:
+                self._created.pop(user.data.email, None)
+            errors.extend(
+                UserImportError(row=user.row_number, email=user.data.email,
+                                errors=["Conflicts with changes made during import, batch not imported"])
+                for user in valid
+            )
+            return 0, errors
+
+        return len(valid), errors
+
+    def _check_duplicates_in_file(self, pending: List[_PendingUser]):
+        for user in pending:
+            if user.data.email in self._seen_emails:
+                user.errors.append("Duplicate email in file")
+            self._seen_emails.add(user.data.email)
+            if user.data.phone:
+                if user.data.phone in self._seen_phones:
+                    user.errors.append("Duplicate phone in file")
+                self._seen_phones.add(user.data.phone)
+
+    async def _check_existing_users(self, pending: List[_PendingUser]):
+        emails = {user.data.email for user in pending}
+        phones = {user.data.phone for user in pending if user.data.phone}
+        result = await self.db.execute(
+            select(func.lower(User.email), User.phone)
+            .where(or_(func.lower(User.email) == any_(string_array(emails)), User.phone == any_(string_array(phones))))
+        )
+        existing_emails = set()
+        existing_phones = set()
+        for email, phone in result.all():
+            existing_emails.add(email)
+            existing_phones.add(phone)
+        for user in pending:
+            if user.data.email in existing_emails:
+                user.errors.append("User already exists")
+            if user.data.phone and user.data.phone in existing_phones:
+                user.errors.append("User with this phone number already exists")
+
+    def _resolve_roles(self, pending: List[_PendingUser]):
+        # roles are taken from the in-memory rbac matrix, a role can be given by id or by name
+        role_ids_by_name = {entry.name: role_id for role_id, entry in rbac_matrix.roles.items()}
+        for user in pending:
+            for role in user.data.roles:
+                role_id = role.lower() if role.lower() in rbac_matrix.roles else role_ids_by_name.get(role.casefold())
+                if role_id is None:
+                    user.errors.append(f"Role {role} doesn't exist")
+                elif (self.min_assignable_level is not None
+                      and rbac_matrix.roles[role_id].hierarchy_level < self.min_assignable_level):
+                    user.errors.append(f"Can't assign role {role}, it is higher than your own")
+                elif uuid.UUID(role_id) not in user.role_ids:
+                    user.role_ids.append(uuid.UUID(role_id))
+
+    async def _resolve_managers(self, pending: List[_PendingUser]) -> dict:
+        """row number -> manager id. reports_to can be id or email of an existing user or of an earlier row"""
+        manager_ids = set()
+        manager_emails = set()
+        for user in pending:
+            reports_to = user.data.reports_to
+            if not reports_to or reports_to.lower() in self._created:
+                continue
+            try:
+                manager_ids.add(uuid.UUID(reports_to))
+            except ValueError:
+                manager_emails.add(reports_to.lower())
+
+        known = {}
+        if manager_ids or manager_emails:
+            result = await self.db.execute(
+                select(User.id, func.lower(User.email))
+                .where(or_(User.id == any_(uuid_array(manager_ids)),
+                           func.lower(User.email) == any_(string_array(manager_emails))))
+            )
+            for manager_id, email in result.all():
+                known[str(manager_id)] = manager_id
+                known[email] = manager_id
+
+        managers = {}
+        for user in pending:
+            reports_to = user.data.reports_to
+            if reports_to:
+                key = reports_to.lower()
+                manager_id = self._created.get(key) or known.get(key)
+                if manager_id is None:
+                    user.errors.append(f"Manager {reports_to} doesn't exist")
+                else:
+                    managers[user.row_number] = manager_id
+            if not user.errors:
+                self._created[user.data.email] = user.id
+        return managers
+
+    async def _get_or_create_departments(self, names: set) -> dict:
+        names.discard(None)
+        if not names:
+            return {}
+        await self.db.execute(
+            pg_insert(Department)
+            .values([{"id": uuid.uuid4(), "department_name": name} for name in names])
+            .on_conflict_do_nothing(index_elements=[Department.department_name])
+        )
+        result = await self.db.execute(
+            select(Department.department_name, Department.id)
+            .where(Department.department_name == any_(string_array(names)))
+        )
+        return dict(result.all())
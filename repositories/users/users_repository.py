@@ -1,49 +1,80 @@
 import uuid
-from typing import List
+from typing import List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from fastapi import HTTPException
-from sqlalchemy.orm import Session, selectinload
-from schemas.users_schema import UserCreate, UserResponse, UserUpdate, UserValidateResponse
-from models.user_model import User, UserRole, Role, Department
-from utilities.auth_utlis import get_password_hash
+from pydantic import ValidationError
+from sqlalchemy import select, delete, update, func, exists, or_, case, literal_column, any_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from schemas.users_schema import UserCreate, UserResponse, UserUpdate, UserValidateResponse, UserListItem, \
+    PaginatedUsersResponse, UserSearchItem, UserPatch, BulkUserSelection, BulkUserStatus, BulkUserTransfer, \
+    BulkUserManagerChange, BulkUsersUpdateResponse
+from models.user_model import User, UserRole, Role, Department, UserHierarchy
+from repositories.users.hierarchy_repository import HierarchyRepository
+from utilities.password_hashing import hash_password_async
+from utilities.access_profile_cache import invalidate_access_profile
+from utilities.rbac_matrix import rbac_matrix
+from utilities.sql_utils import uuid_array
+from utilities.token_versions import bump_token_versions, revoke_deleted_user_tokens, publish_token_versions
+from utilities.pagination import encode_cursor, decode_cursor
+from utilities.user_directory import publish_users_changed
+
+
+#columns that can't be cleared by sending null in a patch
+NOT_NULL_PATCH_FIELDS = ("firstname", "lastname", "email", "password", "is_active", "timezone")
+#changes that make tokens issued before them stale (roles are checked separately)
+TOKEN_CHANGING_FIELDS = ("is_active", "timezone", "department_id", "reports_to", "hashed_password")
+#fields PUT /users/update has always applied, reports_to and timezone are only changed through PATCH
+LEGACY_UPDATE_FIELDS = {"firstname", "lastname", "phone", "is_active", "password", "department_name", "roles"}
+#trigram indexes can't serve LIKE '%xy%' for terms shorter than a trigram, those would scan the whole table
+USER_SEARCH_MIN_LENGTH = 3
 
 
 class UserRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_user(self, user_data: UserCreate):
+    async def create_user(self, user_data: UserCreate, min_assignable_level: Optional[int] = None):
+        # min_assignable_level stops current user from handing out roles above their own level (None for god)
         ##check if user exists. User lower() because casefold() also does special chars conversion which we don't want
-        user_exists = self.db.query(User).filter(User.email == user_data.email.lower()).first()
+        result = await self.db.execute(select(User).where(User.email == user_data.email.lower()))
+        user_exists = result.scalars().first()
         if user_exists:
             raise HTTPException(status_code=400, detail="User already exists")
 
         if user_data.phone:
-            phone_exists = self.db.query(User).filter(User.phone == user_data.phone).first()
+            result = await self.db.execute(select(User).where(User.phone == user_data.phone))
+            phone_exists = result.scalars().first()
             if phone_exists:
                 raise HTTPException(status_code=400, detail="User with this phone number already exists")
 
         ## create password hash
-        password_hash = get_password_hash(user_data.password)
+        password_hash = await hash_password_async(user_data.password)
 
         ##get roles and check if they exists. Create new if they don't and retunr them in array
         roles = []
         for role_id in user_data.roles:
-            role = self.db.query(Role).filter(Role.id == role_id).first()
+            result = await self.db.execute(select(Role).where(Role.id == role_id))
+            role = result.scalars().first()
             if not role:
                 raise HTTPException(status_code=400, detail=f"Role with id {role_id} doesn't exist")
+            if min_assignable_level is not None and role.hierarchy_level < min_assignable_level:
+                raise HTTPException(status_code=403, detail="Can't assign a role higher than your own")
 
             roles.append(role)
 
         # Create or fetch department
         department = None
         if user_data.department_name:
-            department = self.db.query(Department).filter(
-                Department.department_name == user_data.department_name).first()
+            result = await self.db.execute(select(Department).where(
+                Department.department_name == user_data.department_name))
+            department = result.scalars().first()
             if not department:
                 department = Department(department_name=user_data.department_name)
                 self.db.add(department)
-                self.db.flush()  # Ensure department has an ID
+                await self.db.flush()  # Ensure department has an ID
 
         ## create user along with roles.
         user = User(
@@ -57,9 +88,14 @@ class UserRepository:
             roles=[UserRole(role_id=role.id) for role in roles]
         )
 
+        hierarchy_repo = HierarchyRepository(self.db)
+        await hierarchy_repo.lock()
         self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        await self.db.flush()
+        await hierarchy_repo.rebuild([user.id])
+        await publish_users_changed(self.db, [user.id])
+        await self.db.commit()
+        await self.db.refresh(user)
 
         return UserResponse(
             id=user.id,
@@ -73,60 +109,163 @@ class UserRepository:
             department={"id": department.id, "name": department.department_name} if department else None,
         )
 
-    def get_all_users(self):
-        users = (self.db.query(User)
-                 .options(selectinload(User.roles).selectinload(UserRole.role))
-                 .options(selectinload(User.department))
-                 .all())
-        return users
+    async def get_all_users(self, accessible_user_ids=None, limit: int = 50, cursor: Optional[str] = None,
+                            department_id=None, role_id=None, is_active: Optional[bool] = None) -> PaginatedUsersResponse:
+        """
+        One page of users ordered by email, keyset paginated so every page costs the same.
+        Only the listed columns are selected, roles are aggregated by database.
+        """
+        roles_json = (
+            select(func.json_agg(func.json_build_object("id", Role.id, "name", Role.name)))
+            .select_from(UserRole)
+            .join(Role, Role.id == UserRole.role_id)
+            .where(UserRole.user_id == User.id)
+            .scalar_subquery()
+        )
+        query = (
+            select(
+                User.id, User.firstname, User.lastname, User.email, User.phone, User.is_active, User.timezone,
+                User.reports_to, Department.id.label("department_id"), Department.department_name,
+                roles_json.label("roles")
+            )
+            .outerjoin(Department, Department.id == User.department_id)
+            .order_by(User.email)
+            .limit(limit + 1)
+        )
+        if accessible_user_ids is not None:
+            query = query.where(User.id.in_(accessible_user_ids))
+        if cursor is not None:
+            query = query.where(User.email > decode_cursor(cursor, str))
+        if department_id is not None:
+            query = query.where(User.department_id == department_id)
+        if role_id is not None:
+            query = query.where(exists().where(UserRole.user_id == User.id, UserRole.role_id == role_id))
+        if is_active is not None:
+            query = query.where(User.is_active.is_(is_active))
+
+        rows = (await self.db.execute(query)).mappings().all()
+        # one extra row is fetched only to know if there is a next page
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return PaginatedUsersResponse(
+            limit=limit,
+            next_cursor=encode_cursor(rows[-1]["email"]) if has_more else None,
+            results=[
+                UserListItem(
+                    id=row["id"],
+                    firstname=row["firstname"],
+                    lastname=row["lastname"],
+                    email=row["email"],
+                    phone=row["phone"],
+                    is_active=row["is_active"],
+                    timezone=row["timezone"],
+                    reports_to=row["reports_to"],
+                    department={"id": row["department_id"], "name": row["department_name"]} if row["department_id"] else None,
+                    roles=row["roles"] or []
+                )
+                for row in rows
+            ]
+        )
 
-    def get_user_by_email(self, email_id):
-        user = (
-            self.db.query(User)
-            .options(selectinload(User.roles).selectinload(UserRole.role).selectinload(Role.permissions))
-            .options(selectinload(User.department))  # Load department
-            .filter(User.email == email_id)
-            .first()
+    async def search_users(self, term: str, accessible_user_ids=None, limit: int = 10) -> List[UserSearchItem]:
+        """
+        Top matches of term in full name, email or phone. Expressions match the trigram indexes of users table
+        (see migration user_search_trigram_indexes), so contains search doesn't scan the table.
+        Names starting with the term are listed first.
+        """
+        term = term.strip().lower()
+        if len(term) < USER_SEARCH_MIN_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Search term needs at least {USER_SEARCH_MIN_LENGTH} characters")
+        # % and _ typed by user are matched literally
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        contains, prefix = f"%{escaped}%", f"{escaped}%"
+        # separator is inlined, a bind parameter would keep planner from matching the index expression
+        full_name = func.lower(User.firstname + literal_column("' '") + User.lastname)
+        email = func.lower(User.email)
+        phone = func.lower(User.phone)
+
+        query = (
+            select(User.id, User.firstname, User.lastname, User.email, User.phone, Department.department_name)
+            .outerjoin(Department, Department.id == User.department_id)
+            .where(or_(
+                full_name.like(contains, escape="\\"),
+                email.like(contains, escape="\\"),
+                phone.like(contains, escape="\\")
+            ))
+            .order_by(
+                case((or_(full_name.like(prefix, escape="\\"), func.lower(User.lastname).like(prefix, escape="\\"),
+                          email.like(prefix, escape="\\")), 0), else_=1),
+                User.firstname,
+                User.lastname
+            )
+            .limit(limit)
+        )
+        if accessible_user_ids is not None:
+            query = query.where(User.id.in_(accessible_user_ids))
+
+        rows = (await self.db.execute(query)).mappings().all()
+        return [UserSearchItem(**row) for row in rows]
+
+    async def get_auth_profile(self, email: str = None, user_id=None) -> Optional[UserValidateResponse]:
+        """
+        User with its roles and department for login/refresh in one statement. Roles are aggregated by database
+        so no ORM objects are loaded. Permissions aren't needed, they come from rbac matrix. None if user doesn't exist.
+        """
+        roles_json = (
+            select(func.json_agg(func.json_build_object(
+                "name", Role.name,
+                "id", Role.id,
+                "hierarchy_level", Role.hierarchy_level,
+                "can_cross_departments", Role.can_cross_departments
+            )))
+            .select_from(UserRole)
+            .join(Role, Role.id == UserRole.role_id)
+            .where(UserRole.user_id == User.id)
+            .scalar_subquery()
         )
+        query = (
+            select(
+                User.id, User.firstname, User.lastname, User.email, User.phone, User.hashed_password,
+                User.reports_to, User.timezone, User.is_active, User.token_version,
+                Department.id.label("department_id"), Department.department_name, roles_json.label("roles")
+            )
+            .outerjoin(Department, Department.id == User.department_id)
+        )
+        if email is not None:
+            query = query.where(User.email == email)
+        else:
+            query = query.where(User.id == user_id)
 
-        if user is None:
-            raise HTTPException(status_code=404, detail="User doesn't exist")
-
-        # Extract permissions from roles
-        permissions_set = set()
-        for user_role in user.roles:
-            for permission in user_role.role.permissions:
-                permissions_set.add(permission.name)
+        row = (await self.db.execute(query)).mappings().first()
+        if row is None:
+            return None
 
         return UserValidateResponse(
-            id=user.id,
-            firstname=user.firstname,
-            lastname=user.lastname,
-            email=user.email,
-            phone=user.phone,
-            hashed_password=user.hashed_password,
-            roles=[{
-                "name": user_role.role.name,
-                "id": user_role.role.id,
-                "hierarchy_level": user_role.role.hierarchy_level,
-                "can_cross_departments": user_role.role.can_cross_departments
-            } for user_role in user.roles],
-            # Extract role names correctly
-            department_name=user.department.department_name if user.department else None,
-            permissions=list(permissions_set),
-            department={"id": user.department.id, "name": user.department.department_name} if user.department else None,
-            timezone=user.timezone if user.timezone else None
+            id=row["id"],
+            firstname=row["firstname"],
+            lastname=row["lastname"],
+            email=row["email"],
+            phone=row["phone"],
+            hashed_password=row["hashed_password"],
+            reports_to=row["reports_to"],
+            # role ids come back as text from json
+            roles=[{**role, "id": uuid.UUID(role["id"])} for role in row["roles"] or []],
+            department_name=row["department_name"],
+            department={"id": row["department_id"], "name": row["department_name"]} if row["department_id"] else None,
+            timezone=row["timezone"],
+            is_active=row["is_active"],
+            token_version=row["token_version"]
         )
 
     ## I modified this function to not return pydentic model and stick to sqlalchemy model for better use.
-    def get_user_by_id(self, id):
-        user = (
-            self.db.query(User)
+    async def get_user_by_id(self, id):
+        result = await self.db.execute(
+            select(User)
             .options(selectinload(User.roles).selectinload(UserRole.role).selectinload(Role.permissions))
             .options(selectinload(User.department))  # Load department
-            .filter(User.id == id)
-            .first()
+            .where(User.id == id)
         )
+        user = result.scalars().first()
 
         if user is None:
             raise HTTPException(status_code=404, detail="User doesn't exist")
@@ -139,66 +278,258 @@ class UserRepository:
                 
         return user
 
-    def update_user(self, user_data: UserUpdate):
-        # Fetch existing user
-        user = (
-            self.db.query(User)
-            .options(selectinload(User.roles))
-            .options(selectinload(User.department))
-            .filter(User.email == user_data.email)
-            .first()
+    async def update_user(self, user_data: UserUpdate, min_assignable_level: Optional[int] = None):
+        # PUT by email, fields left empty keep their value
+        result = await self.db.execute(select(User.id).where(User.email == user_data.email))
+        user_id = result.scalar()
+        if user_id is None:
+            raise HTTPException(status_code=404, detail="User doesn't exist")
+        # empty values keep the current value as they always did on PUT
+        changes = {
+            field: value for field, value in user_data.model_dump(include=LEGACY_UPDATE_FIELDS).items()
+            if value is not None and value != ""
+        }
+        try:
+            patch = UserPatch(**changes)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+        return await self.patch_user(user_id, patch, min_assignable_level)
+
+    async def patch_user(self, user_id, patch: UserPatch, min_assignable_level: Optional[int] = None) -> UserResponse:
+        """
+        Change only the fields sent and only where they differ from stored values. Roles are diffed against
+        current ones, so unchanged assignments aren't touched. Everything happens in one transaction, tokens are
+        revoked only when something they carry (or status/password) actually changed.
+        min_assignable_level stops current user from adding/removing roles above their own level (None for god).
+        """
+        changes = patch.model_dump(exclude_unset=True)
+        for field in NOT_NULL_PATCH_FIELDS:
+            if field in changes and changes[field] is None:
+                raise HTTPException(status_code=400, detail=f"{field} can't be null")
+        if "reports_to" in changes:
+            # before the row lock, tree changes always take the hierarchy lock first
+            await HierarchyRepository(self.db).lock()
+
+        result = await self.db.execute(
+            select(
+                User.firstname, User.lastname, User.email, User.phone, User.is_active, User.timezone,
+                User.department_id, User.reports_to,
+                select(func.array_agg(UserRole.role_id)).where(UserRole.user_id == User.id)
+                .scalar_subquery().label("role_ids")
+            )
+            .where(User.id == user_id)
+            .with_for_update(of=User)
         )
-
-        if user is None:
+        current = result.mappings().first()
+        if current is None:
             raise HTTPException(status_code=404, detail="User doesn't exist")
 
-        # Update basic fields
-        user.firstname = user_data.firstname or user.firstname
-        user.lastname = user_data.lastname or user.lastname
-        user.phone = user_data.phone or user.phone
-        user.is_active = user_data.is_active if user_data.is_active is not None else user.is_active
-
-        #update password if requested
-        if user_data.password is not None:
-            password_hash = get_password_hash(user_data.password)
-            user.hashed_password = password_hash
-
-        #update department by getting the id first
-        department_new = self.db.query(Department).filter(
-            Department.department_name == user_data.department_name).first()
-        if department_new is not None:
-            user.department_id = department_new.id
-
-        # Commit first to ensure user_id is assigned before updating roles
-        self.db.commit()
-        self.db.refresh(user)  # Refresh user instance after commit
-
-        ##get roles and check if they exists. Create new if they don't and retunr them in array
-        roles = []
-        for role_name in user_data.roles:
-            role = self.db.query(Role).filter(Role.name == role_name).first()
-            if role is not None:
-                roles.append(role)
-
-        # Remove all existing roles
-        self.db.query(UserRole).filter(UserRole.user_id == user.id).delete()
-        self.db.commit()  # Commit to reflect the deletion in the database
-
-        # Assign new roles
-        user.roles = [UserRole(user_id=user.id, role_id=role.id) for role in roles]
-
-        # Commit again to save new roles
-        self.db.commit()
-        self.db.refresh(user)
-
-        return UserResponse(
-            id=user.id,
-            firstname=user.firstname,
-            lastname=user.lastname,
-            email=user.email,
-            phone=user.phone,
-            department={"id": user.department.id, "name": user.department.department_name} if user.department else None,
+        if "email" in changes:
+            changes["email"] = changes["email"].lower()
+        if "department_name" in changes:
+            changes["department_id"] = await self._get_department_id(changes.pop("department_name"))
+        role_ids = changes.pop("roles", None)
+        password = changes.pop("password", None)
+        values = {field: value for field, value in changes.items() if value != current[field]}
+
+        if "email" in values or values.get("phone"):
+            await self._check_contact_available(user_id, values.get("email"), values.get("phone"))
+        if values.get("timezone") is not None:
+            try:
+                ZoneInfo(values["timezone"])
+            except (ZoneInfoNotFoundError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid timezone")
+        if values.get("reports_to") is not None:
+            await self.validate_manager(user_id, values["reports_to"])
+        if password is not None:
+            values["hashed_password"] = await hash_password_async(password)
+
+        roles_changed = False
+        if role_ids is not None:
+            roles_changed = await self._reconcile_roles(user_id, set(current["role_ids"] or ()), set(role_ids),
+                                                        min_assignable_level)
+
+        # roles, department, manager, timezone are in token claims, status/password changes must log user out
+        revoke_tokens = roles_changed or any(field in values for field in TOKEN_CHANGING_FIELDS)
+        if values or revoke_tokens:
+            query = update(User).where(User.id == user_id).values(**values).returning(User.token_version)
+            if revoke_tokens:
+                query = query.values(token_version=User.token_version + 1)
+            token_version = (await self.db.execute(query.execution_options(synchronize_session=False))).scalar()
+            if revoke_tokens:
+                await publish_token_versions(self.db, {str(user_id): token_version})
+        if "reports_to" in values:
+            #move user (with everyone reporting to them) under new manager
+            await HierarchyRepository(self.db).rebuild([user_id])
+        if values:
+            await publish_users_changed(self.db, [user_id])
+        await self.db.commit()
+        if revoke_tokens:
+            invalidate_access_profile(user_id)
+
+        profile = await self.get_auth_profile(user_id=user_id)
+        return UserResponse(**profile.model_dump(include=set(UserResponse.model_fields)))
+
+    async def _get_department_id(self, department_name: Optional[str]):
+        if department_name is None:
+            return None
+        result = await self.db.execute(select(Department.id).where(Department.department_name == department_name))
+        department_id = result.scalar()
+        if department_id is None:
+            raise HTTPException(status_code=400, detail="Department doesn't exist")
+        return department_id
+
+    async def _check_contact_available(self, user_id, email: Optional[str], phone: Optional[str]):
+        conditions = []
+        if email is not None:
+            conditions.append(func.lower(User.email) == email)
+        if phone:
+            conditions.append(User.phone == phone)
+        result = await self.db.execute(select(User.email, User.phone).where(User.id != user_id, or_(*conditions)))
+        row = result.first()
+        if row is None:
+            return
+        if email is not None and row.email.lower() == email:
+            raise HTTPException(status_code=400, detail="User already exists")
+        raise HTTPException(status_code=400, detail="User with this phone number already exists")
+
+    async def _reconcile_roles(self, user_id, current_role_ids: set, role_ids: set,
+                               min_assignable_level: Optional[int] = None) -> bool:
+        """Make user's roles equal role_ids with one delete and one insert of the difference, True if anything changed"""
+        to_add = role_ids - current_role_ids
+        to_remove = current_role_ids - role_ids
+        for role_id in to_add | to_remove:
+            role = rbac_matrix.roles.get(str(role_id))
+            if role is None:
+                raise HTTPException(status_code=400, detail=f"Role with id {role_id} doesn't exist")
+            if min_assignable_level is not None and role.hierarchy_level < min_assignable_level:
+                raise HTTPException(status_code=403, detail="Can't assign or remove a role higher than your own")
+
+        if to_remove:
+            await self.db.execute(
+                delete(UserRole).where(UserRole.user_id == user_id, UserRole.role_id == any_(uuid_array(to_remove)))
+            )
+        if to_add:
+            await self.db.execute(
+                pg_insert(UserRole)
+                .values([{"id": uuid.uuid4(), "user_id": user_id, "role_id": role_id} for role_id in to_add])
+                .on_conflict_do_nothing(constraint="uq_user_roles_user_id_role_id")
+            )
+        return bool(to_add or to_remove)
+
+    async def bulk_set_active(self, data: BulkUserStatus, accessible_user_ids=None,
+                              current_user_id=None) -> BulkUsersUpdateResponse:
+        # current user is never part of the selection, nobody deactivates themselves by a filter
+        user_ids, response = await self._select_bulk_users(data, accessible_user_ids, exclude_user_id=current_user_id)
+        changed = await self._bulk_update_column(user_ids, User.is_active, data.is_active)
+        return await self._commit_bulk_update(changed, response)
+
+    async def bulk_transfer_department(self, data: BulkUserTransfer, accessible_user_ids=None) -> BulkUsersUpdateResponse:
+        if data.department_id is not None:
+            result = await self.db.execute(select(Department.id).where(Department.id == data.department_id))
+            if result.first() is None:
+                raise HTTPException(status_code=400, detail="Department doesn't exist")
+        user_ids, response = await self._select_bulk_users(data, accessible_user_ids)
+        changed = await self._bulk_update_column(user_ids, User.department_id, data.department_id)
+        return await self._commit_bulk_update(changed, response)
+
+    async def bulk_change_manager(self, data: BulkUserManagerChange, accessible_user_ids=None) -> BulkUsersUpdateResponse:
+        hierarchy_repo = HierarchyRepository(self.db)
+        await hierarchy_repo.lock()
+        user_ids, response = await self._select_bulk_users(data, accessible_user_ids)
+        if data.reports_to is not None:
+            result = await self.db.execute(select(User.id).where(User.id == data.reports_to))
+            if result.first() is None:
+                raise HTTPException(status_code=400, detail="Manager doesn't exist")
+            # closure has a row for every user and each of their managers (and user itself), one lookup covers all
+            result = await self.db.execute(
+                select(UserHierarchy.ancestor_id)
+                .where(UserHierarchy.ancestor_id == any_(uuid_array(user_ids)),
+                       UserHierarchy.descendant_id == data.reports_to)
+                .limit(1)
+            )
+            if result.first() is not None:
+                raise HTTPException(status_code=400,
+                                    detail="Users can't report to themselves or to someone reporting to them")
+        changed = await self._bulk_update_column(user_ids, User.reports_to, data.reports_to)
+        #moved users take everyone reporting to them along
+        await hierarchy_repo.rebuild(changed)
+        return await self._commit_bulk_update(changed, response)
+
+    async def _select_bulk_users(self, data: BulkUserSelection, accessible_user_ids,
+                                 exclude_user_id=None) -> tuple[list, BulkUsersUpdateResponse]:
+        """Ids of selected users current user can access, locked until commit, and response with listed ids skipped"""
+        if data.user_ids is None and data.current_department_id is None and data.current_manager_id is None:
+            raise HTTPException(status_code=400,
+                                detail="Select users by user_ids, current_department_id or current_manager_id")
+        query = select(User.id).order_by(User.id).with_for_update()
+        if data.user_ids is not None:
+            query = query.where(User.id == any_(uuid_array(set(data.user_ids))))
+        if data.current_department_id is not None:
+            query = query.where(User.department_id == data.current_department_id)
+        if data.current_manager_id is not None:
+            query = query.where(User.reports_to == data.current_manager_id)
+        if accessible_user_ids is not None:
+            query = query.where(User.id.in_(accessible_user_ids))
+        if exclude_user_id is not None:
+            query = query.where(User.id != uuid.UUID(str(exclude_user_id)))
+        user_ids = list((await self.db.execute(query)).scalars().all())
+
+        selected = set(user_ids)
+        skipped = [user_id for user_id in dict.fromkeys(data.user_ids or ()) if user_id not in selected]
+        return user_ids, BulkUsersUpdateResponse(matched=len(user_ids), changed=0, skipped_user_ids=skipped)
+
+    async def _bulk_update_column(self, user_ids: list, column, value) -> list:
+        """
+        Set column for all users in one UPDATE, rows already having the value are left alone.
+        Changed users' tokens are revoked as the column is in claims or is the status. Returns ids of changed users.
+        """
+        if not user_ids:
+            return []
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == any_(uuid_array(user_ids)), column.is_distinct_from(value))
+            .values({column: value, User.token_version: User.token_version + 1})
+            .returning(User.id, User.token_version)
+            .execution_options(synchronize_session=False)
         )
-
-    def get_users_by_ids(self, user_ids: List[int]):
-        return self.db.query(User).filter(User.id.in_(user_ids)).all()
\ No newline at end of file
+        versions = {user_id: version for user_id, version in result.all()}
+        await publish_token_versions(self.db, {str(user_id): version for user_id, version in versions.items()})
+        await publish_users_changed(self.db, versions)
+        return list(versions)
+
+    async def _commit_bulk_update(self, changed: list, response: BulkUsersUpdateResponse) -> BulkUsersUpdateResponse:
+        await self.db.commit()
+        # other workers drop these profiles when they receive the token versions event
+        for user_id in changed:
+            invalidate_access_profile(user_id)
+        response.changed = len(changed)
+        return response
+
+    async def validate_manager(self, user_id, manager_id):
+        result = await self.db.execute(select(User.id).where(User.id == manager_id))
+        if result.first() is None:
+            raise HTTPException(status_code=400, detail="Manager doesn't exist")
+        if await HierarchyRepository(self.db).is_in_subtree(user_id, manager_id):
+            raise HTTPException(status_code=400, detail="User can't report to themselves or to someone reporting to them")
+
+    async def delete_user(self, user_id) -> bool:
+        hierarchy_repo = HierarchyRepository(self.db)
+        await hierarchy_repo.lock()
+        direct_reports = await hierarchy_repo.get_direct_reports(user_id)
+
+        # db level cascades clear roles, logs and leaves. reports_to of direct reports is set to null
+        result = await self.db.execute(delete(User).where(User.id == user_id))
+        if result.rowcount == 0:
+            return False
+
+        # direct reports are roots now, their subtrees lose the deleted user's managers
+        await hierarchy_repo.rebuild(direct_reports)
+        # reports_to in tokens of direct reports is stale
+        await bump_token_versions(self.db, direct_reports)
+        await revoke_deleted_user_tokens(self.db, user_id)
+        # deleted user is dropped from directory, direct reports lost their manager
+        await publish_users_changed(self.db, [user_id, *direct_reports])
+        await self.db.commit()
+        invalidate_access_profile(user_id)
+        return True
@@ -2,15 +2,17 @@ from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from datetime import datetime, date, time
-from sqlalchemy.orm import Session
-from configurations.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from configurations.database import get_async_db
+from models.attendance_model import PRESENCE_PUNCHED_IN, PRESENCE_ON_BREAK, PRESENCE_DAY_ENDED
 from models.user_model import User
-from repositories.users.users_repository import UserRepository
-from schemas.attendance_schema import TimeLogCreate, TimeSummaryRead, TimeLogRead, TimeSummaryCreate
+from schemas.attendance_schema import TimeLogCreate, TimeSummaryRead, TimeLogRead
 from utilities.permission_utlis import enforce_permissions_dependency, register_permission
+from utilities.principal import Principal
 from repositories.attendance.attendance_repository import AttendanceRepository
-from dotenv import load_dotenv
-import os
+from utilities.get_accessible_users import accessible_user_ids_query, reporting_user_ids_query
+from utilities.user_directory import user_directory
+from utilities.time_utils import local_date
 import pytz
 
 router = APIRouter(
@@ -22,134 +24,84 @@ router = APIRouter(
 @router.post("/punch-in", response_model=TimeLogRead)
 @register_permission('punch_in')
 async def punch_in(
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
-    ###check if there is an open existing log. If yes, raise an error
+    ###create a new time log, nothing is created if there is an open log already
     attendance_repo = AttendanceRepository(db)
-    user_id = current_user.get('sub')
-    existing_log = attendance_repo.check_if_time_log_exists(user_id)
-    if existing_log:
+    time_log_data = TimeLogCreate(
+        user_id=current_user.user_id,
+        punch_in_time=datetime.utcnow()
+    )
+    time_log = await attendance_repo.open_time_log(time_log_data, current_user.timezone)
+    if time_log is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You already have an open time log."
         )
-
-    ###create a new time log
-    time_log_data = TimeLogCreate(
-        user_id=user_id,
-        punch_in_time=datetime.utcnow()
-    )
-
-    return attendance_repo.create_time_log(time_log_data)
+    return time_log
 
 
 @router.post("/punch-out", response_model=TimeLogRead)
 @register_permission('punch_out')
 async def punch_out(
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
-    ###check if there is an open existing log. If no, raise an error
+    ###close the open time log with punch out time
     attendance_repo = AttendanceRepository(db)
-    user_id = current_user.get('sub')
-    existing_log = attendance_repo.check_if_time_log_exists(user_id)
-    if not existing_log:
+    time_log = await attendance_repo.close_open_time_log(current_user.user_id, datetime.utcnow(), current_user.timezone)
+    if time_log is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You do not have an open time log."
         )
-    ###update the existing time log with punch out time
-    existing_log.punch_out_time = datetime.utcnow()
-    existing_log.duration = (existing_log.punch_out_time - existing_log.punch_in_time).total_seconds()
-    db.commit()
-    db.refresh(existing_log)
-    return TimeLogRead(
-        id=existing_log.id,
-        user_id=existing_log.user_id,
-        punch_in_time=existing_log.punch_in_time,
-        punch_out_time=existing_log.punch_out_time,
-        duration=existing_log.duration
-    )
+    return time_log
 
 
-@router.post("/day-end")
+@router.post("/day-end", response_model=TimeSummaryRead)
 @register_permission('day_end')
 async def day_end(
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
-    #this is not optimized endpoint. This will need optimization in future
-    load_dotenv()
-    min_hours = os.getenv("MIN_WORK_HOURS_PER_DAY") or "8"
-    user_id = current_user.get("sub")
-    user_timezone_str = current_user.get("timezone")
-    user_tz = pytz.timezone(user_timezone_str)
-    now_local = datetime.now(user_tz)
-
-    # Define day start and end in user's local time
-    start_local = user_tz.localize(datetime.combine(now_local.date(), time.min))
-    end_local = user_tz.localize(datetime.combine(now_local.date(), time.max))
-
-    # Convert to UTC for DB query
-    start_utc = start_local.astimezone(pytz.utc)
-    end_utc = end_local.astimezone(pytz.utc)
-
+    # open log is closed and its time added to the summary of its day, which is then closed. Nothing is re-read
     attendance_repo = AttendanceRepository(db)
-
-    # Close any open punch log
-    existing_log = attendance_repo.check_if_time_log_exists(user_id)
-    if existing_log:
-        existing_log.punch_out_time = datetime.utcnow()
-        existing_log.duration = (existing_log.punch_out_time - existing_log.punch_in_time).total_seconds()
-        db.commit()
-        db.refresh(existing_log)
-
-
-    # Fetch logs for the day
-    logs = attendance_repo.get_time_logs_for_range(user_id, start_utc, end_utc)
-    if not logs:
+    user_id = current_user.user_id
+    now = datetime.utcnow()
+    summary = await attendance_repo.end_day(user_id, now, current_user.timezone)
+    if summary is None:
+        if await attendance_repo.get_time_summary(user_id, local_date(now, current_user.timezone)):
+            raise HTTPException(status_code=400, detail="Summary already exists for today.")
         raise HTTPException(status_code=404, detail="No punch logs found for today.")
+    return summary
 
-    # First punch in and last punch out
-    first_punch_in = min(log.punch_in_time for log in logs)
-    last_punch_out = max((log.punch_out_time or datetime.utcnow()) for log in logs)
-
-    # Total worked time
-    actual_seconds = sum(log.duration or 0 for log in logs)
-    min_seconds = int(min_hours) * 60 * 60
-    overtime = max(0, actual_seconds - min_seconds)
-
-    summary_date = now_local.date()
-
-    # Check if summary already exists for the day
-    existing_summary = attendance_repo.check_summary_exists_for_date(user_id, summary_date)
-
-    if existing_summary:
-        raise HTTPException(status_code=400, detail="Summary already exists for today.")
 
-    summary = TimeSummaryCreate(
-        user_id=user_id,
-        date=summary_date,
-        actual_seconds=actual_seconds,
-        min_seconds=min_seconds,
-        overtime_seconds=overtime,
-        day_start_time=first_punch_in,
-        day_end_time=last_punch_out
-    )
-
-    return attendance_repo.create_time_summary(summary)
+#worked time of a local day, kept up to date by every punch out
+@router.get("/summary", response_model=TimeSummaryRead)
+@register_permission('view_time_logs')
+async def get_time_summary(
+        date_param: Optional[date] = Query(default=None, description="Local date (YYYY-MM-DD), today by default"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    target_date = date_param or local_date(datetime.utcnow(), current_user.timezone)
+    attendance_repo = AttendanceRepository(db)
+    summary = await attendance_repo.get_time_summary(current_user.user_id, target_date)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No punch logs found for this date.")
+    return summary
 
 
 @router.get("/user-logs", response_model=List[TimeLogRead])
 @register_permission('view_time_logs')
 async def get_user_time_logs(
         date_param: Optional[date] = Query(default=None, description="Filter by date (YYYY-MM-DD)"),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
-    user_id = current_user.get("sub")
-    user_timezone_str = current_user.get("timezone")
+    user_id = current_user.user_id
+    user_timezone_str = current_user.timezone
     user_tz = pytz.timezone(user_timezone_str)
 
     # Determine date range in local time
@@ -162,7 +114,7 @@ async def get_user_time_logs(
     end_utc = end_local.astimezone(pytz.utc)
 
     attendance_repo = AttendanceRepository(db)
-    logs = attendance_repo.get_time_logs_for_range(user_id, start_utc, end_utc)
+    logs = await attendance_repo.get_time_logs_for_range(user_id, start_utc, end_utc)
 
     return logs
 
@@ -170,33 +122,28 @@ async def get_user_time_logs(
 @router.get("/active-status")
 @register_permission('view_user_status')
 async def get_user_active_status(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(enforce_permissions_dependency)
+    team_only: bool = Query(False, description="Only users reporting to you directly or indirectly"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(enforce_permissions_dependency)
 ):
-    now = datetime.utcnow()
-    today_start = datetime.combine(now.date(), time.min)
-    today_end = datetime.combine(now.date(), time.max)
-
     attendance_repo = AttendanceRepository(db)
-    user_repo = UserRepository(db)
-
-    # 1. Users with open time logs (punched-in, not yet punched out)
-    open_logs = attendance_repo.get_open_time_logs(today_start, today_end)
-    open_user_ids = [log.user_id for log in open_logs]
+    # only users accessible to current user are listed
+    accessible_user_ids = accessible_user_ids_query(current_user)
+    if team_only:
+        accessible_user_ids = accessible_user_ids.where(User.id.in_(reporting_user_ids_query(current_user.user_id)))
 
-    # 2. Users who punched out today but do NOT have a time summary yet
-    punched_out_logs = attendance_repo.get_users_on_break()
-    break_user_ids = [log.user_id for log in punched_out_logs if log.user_id not in open_user_ids]
+    # one read of the presence table, state is kept current by punch in/out and day end
+    presence = await attendance_repo.get_presence(accessible_user_ids)
+    # names come from in-memory directory, one lookup for all users
+    users = await user_directory.get_many({user_id for user_id, _, _ in presence}, db)
 
-    # 3. Users who have punched out and have a time summary
-    user_ended_work = attendance_repo.get_users_has_day_ended()
-    user_ended_word_ids = [log.user_id for log in user_ended_work]
-    users_punched_in = user_repo.get_users_by_ids(open_user_ids)
-    users_on_break = user_repo.get_users_by_ids(break_user_ids)
-    users_ended_work = user_repo.get_users_by_ids(user_ended_word_ids)
+    states = {PRESENCE_PUNCHED_IN: [], PRESENCE_ON_BREAK: [], PRESENCE_DAY_ENDED: []}
+    for user_id, state, changed_at in presence:
+        if user_id in users and state in states:
+            states[state].append({"id": user_id, "name": users[user_id].display_name, "since": changed_at})
 
     return {
-        "punched_in_users": [{"id": user.id, "name": f"{user.firstname} {user.lastname}"} for user in users_punched_in],
-        "on_break_users": [{"id": user.id, "name": f"{user.firstname} {user.lastname}"} for user in users_on_break],
-        "user_ended_work": [{"id": user.id, "name": f"{user.firstname} {user.lastname}"} for user in users_ended_work]
+        "punched_in_users": states[PRESENCE_PUNCHED_IN],
+        "on_break_users": states[PRESENCE_ON_BREAK],
+        "user_ended_work": states[PRESENCE_DAY_ENDED]
     }
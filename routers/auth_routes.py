@@ -1,14 +1,14 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from schemas.auth_schema import AuthLogin
-from configurations.database import get_db
+from configurations.database import get_async_db
 from repositories.users.users_repository import UserRepository
-from schemas.users_schema import UserValidateResponse
-from utilities.auth_utlis import verify_password, generate_tokens, verify_access_token, generate_access_token, \
+from utilities.auth_utlis import generate_tokens, verify_access_token, generate_access_token, \
     verify_refresh_token, security
+from utilities.password_hashing import verify_password_async
 
 router = APIRouter(
     prefix="/auth",
@@ -17,18 +17,22 @@ router = APIRouter(
 
 #create department
 @router.post("/token", status_code=status.HTTP_201_CREATED)
-def user_login_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
+async def user_login_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_async_db)):
     try:
         AuthLogin(username=form_data.username, password=form_data.password)
 
         user_repository = UserRepository(db)
-        user = user_repository.get_user_by_email(form_data.username)
+        user = await user_repository.get_auth_profile(email=form_data.username)
         if not user:
             raise HTTPException(status_code=400, detail="Incorrect username or password")
-        is_valid = verify_password(form_data.password, user.hashed_password)
-        if is_valid:
-            return generate_tokens(user)
-        raise HTTPException(status_code=400, detail="Incorrect username or password")
+        #bcrypt is cpu bound, it runs on the size limited password hashing pool
+        is_valid = await verify_password_async(form_data.password, user.hashed_password)
+        if not is_valid:
+            raise HTTPException(status_code=400, detail="Incorrect username or password")
+        #checked after password so account status isn't revealed to callers who don't know it
+        if not user.is_active:
+            raise HTTPException(status_code=403, detail="User is deactivated")
+        return generate_tokens(user)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,9 +41,9 @@ def user_login_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 
 
 @router.post("/refresh", status_code=status.HTTP_201_CREATED)
-def refresh_access_token(
+async def refresh_access_token(
         authorization: HTTPAuthorizationCredentials = Depends(security),  # Authorization header dependency
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     refresh_token = authorization.credentials  # Extract token directly
     payload = verify_refresh_token(refresh_token)
@@ -48,37 +52,14 @@ def refresh_access_token(
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    # Fetch user to ensure they still exist
+    # Fetch user to ensure they still exist, roles and permissions are read again so changes since login apply
     user_repository = UserRepository(db)
-    user = user_repository.get_user_by_id(user_id)
+    user = await user_repository.get_auth_profile(user_id=user_id)
 
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    #deactivation revokes refresh tokens too
+    if not user.is_active:
+        raise HTTPException(status_code=401, detail="User is deactivated")
 
-    # Extract permissions from roles
-    permissions_set = set()
-    for user_role in user.roles:
-        for permission in user_role.role.permissions:
-            permissions_set.add(permission.name)
-
-    user_response = UserValidateResponse(
-        id=user.id,
-        firstname=user.firstname,
-        lastname=user.lastname,
-        email=user.email,
-        phone=user.phone,
-        hashed_password=user.hashed_password,
-        roles=[{
-            "name": user_role.role.name,
-            "id": user_role.role.id,
-            "hierarchy_level": user_role.role.hierarchy_level,
-            "can_cross_departments": user_role.role.can_cross_departments
-        } for user_role in user.roles],
-        # Extract role names correctly
-        department_name=user.department.department_name if user.department else None,
-        permissions=list(permissions_set),
-        department={"id": user.department.id, "name": user.department.department_name} if user.department else None,
-        timezone=user.timezone if user.timezone else None
-    )
-
-    return generate_access_token(user_response)
+    return generate_access_token(user)
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.params import Path
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from models.user_model import User
+from utilities.principal import Principal
 from schemas.department_schema import DepartmentCreate, DepartmentUpdate, DepartmentResponse
 from repositories.departments.department_repository import DepartmentRepository
-from configurations.database import get_db
+from configurations.database import get_async_db
 from utilities.permission_utlis import register_permission, enforce_permissions_dependency
 
 router = APIRouter(
@@ -20,12 +20,12 @@ router = APIRouter(
 @register_permission("create_department")
 async def create_department(
         department: DepartmentCreate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     try:
         dept_repo = DepartmentRepository(db)
-        return dept_repo.create_department(department)
+        return await dept_repo.create_department(department)
     except Exception as e:
         print(f"{e}")
         raise HTTPException(status.HTTP_400_BAD_REQUEST)
@@ -35,12 +35,12 @@ async def create_department(
 @router.get("/", status_code=status.HTTP_200_OK)
 @register_permission("get_all_departments")
 async def get_all_departments(
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     try:
         dept_repo = DepartmentRepository(db)
-        return dept_repo.get_all_departments()
+        return await dept_repo.get_all_departments()
     except Exception as e:
         raise HTTPException(status.HTTP_400_BAD_REQUEST)
 
@@ -50,11 +50,11 @@ async def get_all_departments(
 @register_permission("update_department")
 async def update_department(
         department: DepartmentUpdate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     dept_repo = DepartmentRepository(db)
-    result = dept_repo.update_department(department)
+    result = await dept_repo.update_department(department)
     if not result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Department not found")
     return {"message": "Department updated successfully"}
@@ -65,11 +65,11 @@ async def update_department(
 @register_permission('delete_department')
 async def delete_department(
         department_name: str = Path(..., description="Name of department (case insensitive)"),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     dept_repo = DepartmentRepository(db)
-    result = dept_repo.delete_department(department_name)
+    result = await dept_repo.delete_department(department_name)
 
     if not result:  # If department not found
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Department not found")
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends
+from starlette import status
+
+from configurations.database import async_engine
+from configurations.pool_metrics import pool_metrics
+from configurations.change_events import change_event_bus
+from configurations.day_close_job import day_close_job
+from utilities.principal import Principal
+from utilities.access_profile_cache import access_profile_cache
+from utilities.auth_utlis import token_claims_cache
+from utilities.password_hashing import password_hasher
+from utilities.token_versions import token_version_map
+from utilities.rbac_matrix import rbac_matrix
+from utilities.user_directory import user_directory
+from utilities.permission_utlis import register_permission, enforce_permissions_dependency
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["Internal"]
+)
+
+
+#connection pool stats of the worker serving the request. Each gunicorn worker has its own pool
+@router.get("/db-pool", status_code=status.HTTP_200_OK)
+@register_permission('view_internal_metrics')
+async def get_db_pool_stats(current_user: Principal = Depends(enforce_permissions_dependency)):
+    return pool_metrics.snapshot(async_engine.pool)
+
+
+#hit/miss counters of in-process caches of the worker serving the request
+@router.get("/caches", status_code=status.HTTP_200_OK)
+@register_permission('view_internal_metrics')
+async def get_cache_stats(current_user: Principal = Depends(enforce_permissions_dependency)):
+    return {
+        "token_claims": token_claims_cache.stats(),
+        "access_profile": access_profile_cache.stats(),
+        "token_versions": token_version_map.stats(),
+        "rbac_matrix": {"roles": len(rbac_matrix.roles), "version": rbac_matrix.version},
+        "user_directory": user_directory.stats(),
+        "change_events": change_event_bus.stats()
+    }
+
+
+#runs of the day close job in the worker serving the request (other workers may have done the latest run)
+@router.get("/day-close", status_code=status.HTTP_200_OK)
+@register_permission('view_internal_metrics')
+async def get_day_close_stats(current_user: Principal = Depends(enforce_permissions_dependency)):
+    return day_close_job.stats()
+
+
+#bcrypt pool of the worker serving the request, queued close to max_queue means logins are waiting on cpu
+@router.get("/password-hashing", status_code=status.HTTP_200_OK)
+@register_permission('view_internal_metrics')
+async def get_password_hashing_stats(current_user: Principal = Depends(enforce_permissions_dependency)):
+    return password_hasher.snapshot()
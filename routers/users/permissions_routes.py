@@ -1,14 +1,15 @@
 import uuid
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.params import Path
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from models.user_model import User
+from utilities.principal import Principal
 from schemas.users_schema import RolePermissionAssign
 from repositories.users.roles_repository import RoleRepository
-from configurations.database import get_db
+from configurations.database import get_async_db
 from utilities.permission_utlis import enforce_permissions_dependency, register_permission
+from utilities.auth_utlis import verify_access_token
 
 router = APIRouter(
     prefix="/permissions",
@@ -19,21 +20,51 @@ router = APIRouter(
 @router.get("/", status_code=status.HTTP_200_OK)
 @register_permission('get_all_permissions')
 async def get_all_permissions(
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     role_repo = RoleRepository(db)
-    return role_repo.get_all_permissions()
+    return await role_repo.get_all_permissions()
 
 @router.post("/assign", status_code=status.HTTP_201_CREATED)
 @register_permission('assign_permissions')
 async def assign_permissions(
         permissions: RolePermissionAssign,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     role_repo = RoleRepository(db)
-    return role_repo.assign_permissions(permissions)
+    return await role_repo.assign_permissions(permissions)
+
+
+#add permissions to a role, keeps the ones it already has
+@router.post("/grant", status_code=status.HTTP_201_CREATED)
+@register_permission('grant_permissions')
+async def grant_permissions(
+        permissions: RolePermissionAssign,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    role_repo = RoleRepository(db)
+    return await role_repo.grant_permissions(permissions)
+
+
+#remove only the given permissions from a role
+@router.post("/revoke", status_code=status.HTTP_200_OK)
+@register_permission('revoke_permissions')
+async def revoke_permissions(
+        permissions: RolePermissionAssign,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    role_repo = RoleRepository(db)
+    return await role_repo.revoke_permissions(permissions)
+
+
+#roles and permissions of the current user as evaluated now, token only carries role ids
+@router.get("/me", status_code=status.HTTP_200_OK)
+async def get_my_permissions(current_user: Principal = Depends(verify_access_token)):
+    return {"roles": sorted(current_user.roles), "permissions": sorted(current_user.permissions)}
 
 
 ## get role permissions endpoint to be implemented to check which role has which permissions
\ No newline at end of file
@@ -1,14 +1,15 @@
 import uuid
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.params import Path
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from models.user_model import User
-from schemas.users_schema import RoleCreate, RoleUpdate
+from utilities.principal import Principal
+from schemas.users_schema import RoleCreate, RoleUpdate, BulkRoleUsers, BulkRoleUsersResponse
 from repositories.users.roles_repository import RoleRepository
-from configurations.database import get_db
+from configurations.database import get_async_db
 from utilities.permission_utlis import register_permission, enforce_permissions_dependency
+from utilities.get_accessible_users import accessible_user_ids_query
 
 router = APIRouter(
     prefix="/roles",
@@ -21,19 +22,19 @@ router = APIRouter(
 @register_permission('create_role')
 async def create_role(
         role: RoleCreate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     role_repo = RoleRepository(db)
-    return role_repo.create_role(role)
+    return await role_repo.create_role(role)
 
 
 #get department
 @router.get("/", status_code=status.HTTP_200_OK)
 @register_permission('get_all_roles')
-async def get_all_roles(db: Session = Depends(get_db), current_user: User = Depends(enforce_permissions_dependency)):
+async def get_all_roles(db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(enforce_permissions_dependency)):
     role_repo = RoleRepository(db)
-    return role_repo.get_all_roles()
+    return await role_repo.get_all_roles()
     pass
 
 
@@ -42,11 +43,11 @@ async def get_all_roles(db: Session = Depends(get_db), current_user: User = Depe
 @register_permission('update_role')
 async def update_role(
         role: RoleUpdate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     role_repo = RoleRepository(db)
-    return role_repo.update_role(role)
+    return await role_repo.update_role(role)
     pass
 
 
@@ -55,8 +56,40 @@ async def update_role(
 @register_permission('delete_role')
 async def delete_role(
         role_name: str = Path(..., description="Name of Role (case insensitive)"),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     role_repo = RoleRepository(db)
-    return role_repo.delete_role(role_name)
+    return await role_repo.delete_role(role_name)
+
+
+#give a role to many users at once. Users outside current user's access are skipped and reported back
+@router.post("/assign-users", response_model=BulkRoleUsersResponse, status_code=status.HTTP_200_OK)
+@register_permission('bulk_assign_role')
+async def bulk_assign_role(
+        data: BulkRoleUsers,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    role_repo = RoleRepository(db)
+    return await role_repo.bulk_assign_role(
+        data,
+        accessible_user_ids=accessible_user_ids_query(current_user),
+        min_assignable_level=None if current_user.is_god else current_user.min_hierarchy_level
+    )
+
+
+#take a role away from many users at once
+@router.post("/remove-users", response_model=BulkRoleUsersResponse, status_code=status.HTTP_200_OK)
+@register_permission('bulk_remove_role')
+async def bulk_remove_role(
+        data: BulkRoleUsers,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    role_repo = RoleRepository(db)
+    return await role_repo.bulk_remove_role(
+        data,
+        accessible_user_ids=accessible_user_ids_query(current_user),
+        min_assignable_level=None if current_user.is_god else current_user.min_hierarchy_level
+    )
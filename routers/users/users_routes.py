@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, Path
+from typing import Optional, List
+
+from fastapi import APIRouter, Depends, Path, HTTPException, Query, UploadFile, File
 from pydantic import UUID4
 from starlette import status
 
-from schemas.users_schema import UserCreate, UserResponse, UserUpdate
-from sqlalchemy.orm import Session
-from configurations.database import get_db
-from repositories.users.users_repository import UserRepository
+from schemas.users_schema import UserCreate, UserResponse, UserUpdate, PaginatedUsersResponse, UserSearchItem, \
+    UserImportReport, UserPatch, BulkUserStatus, BulkUserTransfer, BulkUserManagerChange, BulkUsersUpdateResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from configurations.database import get_async_db
+from repositories.users.users_repository import UserRepository, USER_SEARCH_MIN_LENGTH
+from repositories.users.user_import_repository import UserImportRepository
 from utilities.permission_utlis import register_permission, enforce_permissions_dependency
-from models.user_model import User
+from utilities.principal import Principal
+from utilities.get_accessible_users import accessible_user_ids_query
+from utilities.import_utils import detect_import_format, iter_import_rows
 
 router = APIRouter(
     prefix="/users",
@@ -19,27 +25,104 @@ router = APIRouter(
 @register_permission('create_user')
 async def create_user(
         user_data: UserCreate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    user_repo = UserRepository(db)
+    return await user_repo.create_user(
+        user_data,
+        min_assignable_level=None if current_user.is_god else current_user.min_hierarchy_level
+    )
+
+#csv (header row, roles separated by ';') or ndjson, one user per row. Valid rows are created, others are listed in the report
+@router.post('/import', response_model=UserImportReport, status_code=status.HTTP_200_OK)
+@register_permission('import_users')
+async def import_users(
+        file: UploadFile = File(...),
+        format: Optional[str] = Query(None, description="csv or ndjson, taken from file name/content type when not given"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    import_format = detect_import_format(file, format)
+    import_repo = UserImportRepository(
+        db,
+        min_assignable_level=None if current_user.is_god else current_user.min_hierarchy_level
+    )
+    return await import_repo.import_users(iter_import_rows(file, import_format))
+
+#bulk lifecycle changes, users are selected by ids and/or current department/manager within current user's scope
+@router.post('/bulk/status', response_model=BulkUsersUpdateResponse, status_code=status.HTTP_200_OK)
+@register_permission('bulk_update_user_status')
+async def bulk_update_user_status(
+        data: BulkUserStatus,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     user_repo = UserRepository(db)
-    return user_repo.create_user(user_data)
+    return await user_repo.bulk_set_active(data, accessible_user_ids_query(current_user), current_user.user_id)
 
-@router.get('/', status_code=status.HTTP_200_OK)
+@router.post('/bulk/department', response_model=BulkUsersUpdateResponse, status_code=status.HTTP_200_OK)
+@register_permission('bulk_transfer_users')
+async def bulk_transfer_users(
+        data: BulkUserTransfer,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    user_repo = UserRepository(db)
+    return await user_repo.bulk_transfer_department(data, accessible_user_ids_query(current_user))
+
+@router.post('/bulk/manager', response_model=BulkUsersUpdateResponse, status_code=status.HTTP_200_OK)
+@register_permission('bulk_change_manager')
+async def bulk_change_manager(
+        data: BulkUserManagerChange,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    user_repo = UserRepository(db)
+    return await user_repo.bulk_change_manager(data, accessible_user_ids_query(current_user))
+
+@router.get('/', response_model=PaginatedUsersResponse, status_code=status.HTTP_200_OK)
 @register_permission('get_all_users')
-async def get_all_users(db: Session = Depends(get_db), current_user: User = Depends(enforce_permissions_dependency)):
+async def get_all_users(
+        limit: int = Query(50, ge=1, le=200, description="Records per page"),
+        cursor: Optional[str] = Query(None, description="next_cursor of previous page"),
+        department_id: Optional[UUID4] = Query(None, description="Filter by department ID"),
+        role_id: Optional[UUID4] = Query(None, description="Filter by role ID"),
+        is_active: Optional[bool] = Query(None, description="Filter by active status"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
     user = UserRepository(db)
-    return user.get_all_users()
+    return await user.get_all_users(
+        accessible_user_ids_query(current_user),
+        limit=limit,
+        cursor=cursor,
+        department_id=department_id,
+        role_id=role_id,
+        is_active=is_active
+    )
+
+#autocomplete for user pickers (reports to, department head, approver). Declared before /{user_id} so it isn't read as id
+@router.get('/search', response_model=List[UserSearchItem], status_code=status.HTTP_200_OK)
+@register_permission('search_users')
+async def search_users(
+        q: str = Query(..., min_length=USER_SEARCH_MIN_LENGTH, max_length=100, description="Part of name, email or phone"),
+        limit: int = Query(10, ge=1, le=50, description="Max matches"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    user_repo = UserRepository(db)
+    return await user_repo.search_users(q, accessible_user_ids_query(current_user), limit)
 
 @router.get('/{user_id}', response_model=UserResponse, status_code=status.HTTP_200_OK)
 @register_permission('get_user_by_id')
 async def get_user_by_id(
         user_id: UUID4 = Path(),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
     user_repo = UserRepository(db)
-    user = user_repo.get_user_by_id(user_id)
+    user = await user_repo.get_user_by_id(user_id)
     return UserResponse(
         id=user.id,
         firstname=user.firstname,
@@ -62,12 +145,45 @@ async def get_user_by_id(
 @register_permission('update_user')
 async def update_user(
         user_data: UserUpdate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(enforce_permissions_dependency)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
 ):
-    ## This api needs to change. Currently this doesn't work correctly.
     user = UserRepository(db)
-    return user.update_user(user_data)
+    return await user.update_user(
+        user_data,
+        min_assignable_level=None if current_user.is_god else current_user.min_hierarchy_level
+    )
+
+#only fields present in body are changed, roles (if sent) is the complete new set
+@router.patch('/{user_id}', response_model=UserResponse, status_code=status.HTTP_200_OK)
+@register_permission('update_user')
+async def patch_user(
+        user_data: UserPatch,
+        user_id: UUID4 = Path(),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    user_repo = UserRepository(db)
+    return await user_repo.patch_user(
+        user_id,
+        user_data,
+        min_assignable_level=None if current_user.is_god else current_user.min_hierarchy_level
+    )
+
+
+@router.delete('/{user_id}', status_code=status.HTTP_200_OK)
+@register_permission('delete_user')
+async def delete_user(
+        user_id: UUID4 = Path(),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(enforce_permissions_dependency)
+):
+    if str(user_id) == current_user.user_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You can't delete yourself")
+    user_repo = UserRepository(db)
+    if not await user_repo.delete_user(user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User doesn't exist")
+    return {"message": "User deleted successfully"}
 
 
 ## to be done
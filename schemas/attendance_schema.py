@@ -37,6 +37,7 @@ class TimeSummaryBase(BaseModel):
     min_seconds: Optional[int] = None
     day_start_time: Optional[datetime] = None
     day_end_time: Optional[datetime] = None
+    is_closed: bool = False
 
 
 class TimeSummaryCreate(TimeSummaryBase):
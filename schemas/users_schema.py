@@ -58,7 +58,7 @@ class UserBase(BaseModel):
     lastname: str
     email: EmailStr
     phone: Optional[str] = None
-    department_name: str = None
+    department_name: Optional[str] = None
     reports_to: Optional[UUID4] = None  # Manager ID
 
 
@@ -74,18 +74,114 @@ class UserUpdate(UserBase):
     department_name: Optional[str] = None
 
 
+# partial update, only fields present in request body are changed. null clears phone, department and manager
+class UserPatch(BaseModel):
+    firstname: Optional[str] = Field(None, min_length=1)
+    lastname: Optional[str] = Field(None, min_length=1)
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = None
+    password: Optional[str] = Field(None, min_length=1)
+    is_active: Optional[bool] = None
+    timezone: Optional[str] = None
+    department_name: Optional[str] = None
+    reports_to: Optional[UUID4] = None
+    roles: Optional[List[UUID4]] = None  # complete new set of role ids
+
+
 class UserResponse(UserBase):
     id: UUID4
     roles: Optional[List[dict]] = None
     permissions: Optional[List[str]] = None  # List of permission names
-    department: dict
+    department: Optional[dict] = None  # None for users without department
     timezone: Optional[str] = None
     class Config:
         from_attributes = True  # Allows SQLAlchemy objects to be converted
 
 
+# row of user listing, built from projected columns (no ORM objects, no password hash)
+class UserListItem(BaseModel):
+    id: UUID4
+    firstname: str
+    lastname: str
+    email: EmailStr
+    phone: Optional[str] = None
+    is_active: bool
+    timezone: Optional[str] = None
+    reports_to: Optional[UUID4] = None
+    department: Optional[dict] = None
+    roles: List[dict] = []
+
+
+class PaginatedUsersResponse(BaseModel):
+    limit: int
+    next_cursor: Optional[str] = None  # pass as cursor to get the next page, None on last page
+    results: List[UserListItem]
+
+
+# users of a bulk lifecycle change, by ids and/or current department/manager. All given conditions must match
+class BulkUserSelection(BaseModel):
+    user_ids: Optional[List[UUID4]] = Field(None, min_length=1, max_length=10000)
+    current_department_id: Optional[UUID4] = None
+    current_manager_id: Optional[UUID4] = None
+
+
+class BulkUserStatus(BulkUserSelection):
+    is_active: bool = False
+
+
+class BulkUserTransfer(BulkUserSelection):
+    department_id: Optional[UUID4] = Field(...)  # null removes users from their department
+
+
+class BulkUserManagerChange(BulkUserSelection):
+    reports_to: Optional[UUID4] = Field(...)  # null leaves users without manager
+
+
+class BulkUsersUpdateResponse(BaseModel):
+    matched: int  # selected users current user can access
+    changed: int  # users whose value actually changed
+    skipped_user_ids: List[UUID4]  # listed users not found or not accessible to current user
+
+
+# one row of bulk import file (csv header or ndjson keys use same names)
+class UserImportRow(BaseModel):
+    firstname: str = Field(..., min_length=1)
+    lastname: str = Field(..., min_length=1)
+    email: EmailStr
+    password: str = Field(..., min_length=1)
+    phone: Optional[str] = None
+    department_name: Optional[str] = None
+    roles: List[str] = Field(..., min_length=1)  # role ids or names
+    reports_to: Optional[str] = None  # id or email of existing user or of a user in an earlier row
+
+
+class UserImportError(BaseModel):
+    row: int  # 1 based data row number, header not counted
+    email: Optional[str] = None
+    errors: List[str]
+
+
+class UserImportReport(BaseModel):
+    total: int
+    created: int
+    failed: int
+    errors: List[UserImportError]
+
+
+# autocomplete match, only what a picker shows
+class UserSearchItem(BaseModel):
+    id: UUID4
+    firstname: str
+    lastname: str
+    email: EmailStr
+    phone: Optional[str] = None
+    department_name: Optional[str] = None
+
+
 class UserValidateResponse(UserResponse):
     hashed_password: str
+    is_active: bool = True
+    token_version: int = 0
 
 
 # User Role Assignment Schema
@@ -94,6 +190,19 @@ class UserRoleAssign(BaseModel):
     role_name: str
 
 
+# Bulk role assignment/removal for many users in one request
+class BulkRoleUsers(BaseModel):
+    role_id: UUID4
+    user_ids: List[UUID4] = Field(..., min_length=1, max_length=10000)
+
+
+class BulkRoleUsersResponse(BaseModel):
+    role_id: UUID4
+    requested: int
+    changed: int  # rows actually inserted/deleted, users who already had (or didn't have) the role are not counted
+    skipped_user_ids: List[UUID4]  # users not found or not accessible to current user
+
+
 # ---------------- Permission Schemas ----------------
 class RolePermissionAssign(BaseModel):
     role_id: UUID4
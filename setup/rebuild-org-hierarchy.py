@@ -0,0 +1,24 @@
+import asyncio
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configurations.database import AsyncSessionLocal, async_engine
+from repositories.users.hierarchy_repository import HierarchyRepository
+
+# Rebuilds user_hierarchy closure table from users.reports_to.
+# Run it if users were changed directly in database: python setup/rebuild-org-hierarchy.py
+
+
+async def rebuild_org_hierarchy():
+    async with AsyncSessionLocal() as db:
+        await HierarchyRepository(db).rebuild()
+        await db.commit()
+    await async_engine.dispose()
+    print("✅ Org hierarchy rebuilt")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_org_hierarchy())
@@ -8,7 +8,7 @@ from passlib.context import CryptContext
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from configurations.database import SessionLocal, engine, Base
-from models.user_model import User, Role, UserRole, Department
+from models.user_model import User, Role, UserRole, Department, UserHierarchy
 
 # Initialize password hasher
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -58,6 +58,8 @@ def create_initial_setup(db: Session):
         # 4. Assign Role to User
         user_role = UserRole(user_id=user.id, role_id=role.id)
         db.add(user_role)
+        # user reports to no one, its only closure row is the one to itself
+        db.add(UserHierarchy(ancestor_id=user.id, descendant_id=user.id, depth=0))
         db.commit()
 
         print(f"✅ User '{DEFAULT_USER_EMAIL}' created and assigned to role '{DEFAULT_ROLE_NAME}' and department '{DEFAULT_DEPARTMENT_NAME}'")
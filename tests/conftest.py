@@ -0,0 +1,95 @@
+import os
+import uuid
+
+import pytest
+from dotenv import load_dotenv
+
+# tests run against the database of DATABASE_URL (migrated, with setup/setup-user.py admin), they are skipped without it
+load_dotenv()
+
+ADMIN_EMAIL = os.getenv("TEST_ADMIN_EMAIL", "admin@example.com")
+ADMIN_PASSWORD = os.getenv("TEST_ADMIN_PASSWORD", "SuperAdmin@123!")
+TEST_USER_PASSWORD = "Test@123!"
+
+
+@pytest.fixture(scope="session")
+def client():
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set")
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+def login(client, email: str, password: str = TEST_USER_PASSWORD):
+    return client.post("/auth/token", data={"username": email, "password": password})
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client) -> dict:
+    response = login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+    if response.status_code != 201:
+        pytest.skip("admin user is missing, run setup/setup-user.py")
+    return bearer(response.json()["access_token"])
+
+
+@pytest.fixture(scope="session")
+def role_id(client, admin_headers) -> str:
+    # lowest level role, login needs at least one role
+    response = client.post("/roles/create", json={"name": f"test-{uuid.uuid4().hex[:8]}", "hierarchy_level": 90},
+                           headers=admin_headers)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+@pytest.fixture
+def create_role(client, admin_headers):
+    # role with given level and permissions (by name), returns its id
+    def _create_role(hierarchy_level: int, permissions=()) -> str:
+        response = client.post("/roles/create", json={"name": f"test-{uuid.uuid4().hex[:8]}",
+                                                      "hierarchy_level": hierarchy_level}, headers=admin_headers)
+        assert response.status_code == 201, response.text
+        new_role_id = response.json()["id"]
+        if permissions:
+            permission_ids = {permission["name"]: permission["id"]
+                              for permission in client.get("/permissions/", headers=admin_headers).json()}
+            response = client.post("/permissions/assign", json={
+                "role_id": new_role_id, "permission_ids": [permission_ids[name] for name in permissions]
+            }, headers=admin_headers)
+            assert response.status_code < 400, response.text
+        return new_role_id
+
+    return _create_role
+
+
+@pytest.fixture
+def department_name(client, admin_headers) -> str:
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    response = client.post("/departments/create", json={"department_name": name}, headers=admin_headers)
+    assert response.status_code == 201, response.text
+    return name
+
+
+@pytest.fixture
+def create_user(client, admin_headers, role_id):
+    # creates a user with given roles (the test role by default), returns its id and email
+    def _create_user(department_name=None, roles=None) -> tuple:
+        email = f"test-{uuid.uuid4().hex[:8]}@example.com"
+        response = client.post("/users/create", json={
+            "firstname": "Test",
+            "lastname": "User",
+            "email": email,
+            "password": TEST_USER_PASSWORD,
+            "roles": roles or [role_id],
+            "department_name": department_name,
+        }, headers=admin_headers)
+        assert response.status_code == 201, response.text
+        return response.json()["id"], email
+
+    return _create_user
@@ -0,0 +1,23 @@
+from tests.conftest import login, bearer
+
+
+def test_bulk_transfer_out_of_department_keeps_users_able_to_sign_in(client, admin_headers, department_name, create_user):
+    users = [create_user(department_name) for _ in range(2)]
+    refresh_tokens = [login(client, email).json()["refresh_token"] for _, email in users]
+    departments = client.get("/departments/", headers=admin_headers).json()
+    department_id = next(department["id"] for department in departments
+                         if department["department_name"] == department_name)
+
+    response = client.post("/users/bulk/department", json={
+        "current_department_id": department_id,
+        "department_id": None,
+    }, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["changed"] == 2
+
+    for (user_id, email), refresh_token in zip(users, refresh_tokens):
+        response = client.post("/auth/refresh", headers=bearer(refresh_token))
+        assert response.status_code == 201, response.text
+        assert login(client, email).status_code == 201
+        user = client.get(f"/users/{user_id}", headers=admin_headers).json()
+        assert user["department"] is None
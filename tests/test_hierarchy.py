@@ -0,0 +1,48 @@
+import asyncio
+import uuid
+
+
+def _set_manager(client, admin_headers, user_ids, manager_id):
+    response = client.post("/users/bulk/manager", json={"user_ids": user_ids, "reports_to": manager_id},
+                           headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+
+def test_concurrent_overlapping_manager_changes(client, admin_headers, department_name, create_user):
+    from sqlalchemy import select
+    from configurations.database import AsyncSessionLocal
+    from models.user_model import UserHierarchy
+    from repositories.users.hierarchy_repository import HierarchyRepository
+    from repositories.users.users_repository import UserRepository
+    from schemas.users_schema import BulkUserManagerChange
+
+    top, middle, bottom, other = (create_user(department_name)[0] for _ in range(4))
+    _set_manager(client, admin_headers, [middle], top)
+    _set_manager(client, admin_headers, [bottom], middle)
+
+    async def change_manager(user_ids, manager_id):
+        async with AsyncSessionLocal() as db:
+            data = BulkUserManagerChange(user_ids=[uuid.UUID(user_id) for user_id in user_ids], reports_to=manager_id)
+            return await UserRepository(db).bulk_change_manager(data)
+
+    async def closure_rows():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(UserHierarchy.ancestor_id, UserHierarchy.descendant_id, UserHierarchy.depth)
+                .where(UserHierarchy.descendant_id.in_([uuid.UUID(user_id) for user_id in (top, middle, bottom, other)]))
+            )
+            return set(result.all())
+
+    async def rebuilt_closure_rows():
+        async with AsyncSessionLocal() as db:
+            await HierarchyRepository(db).rebuild()
+            await db.commit()
+        return await closure_rows()
+
+    async def race():
+        # both rebuilds touch the subtree of middle
+        for manager_id in (other, top) * 10:
+            await asyncio.gather(change_manager([middle], manager_id), change_manager([bottom, middle], manager_id))
+
+    client.portal.call(race)
+    assert client.portal.call(closure_rows) == client.portal.call(rebuilt_closure_rows)
@@ -0,0 +1,16 @@
+import uuid
+from types import SimpleNamespace
+
+
+def test_leave_requests_of_missing_users_are_skipped(client):
+    from configurations.database import AsyncSessionLocal
+    from repositories.leaves.leave_repository import LeaveRepository
+
+    # user deleted between loading the requests and rendering them, directory and database both miss it
+    leave_request = SimpleNamespace(user_id=uuid.uuid4())
+
+    async def to_list_items():
+        async with AsyncSessionLocal() as db:
+            return await LeaveRepository(db)._to_list_items([leave_request])
+
+    assert client.portal.call(to_list_items) == []
@@ -0,0 +1,28 @@
+import base64
+import json
+
+import pytest
+
+from utilities.pagination import encode_cursor, decode_cursor
+
+
+def _cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("a@example.com"), str) == "a@example.com"
+
+
+@pytest.mark.parametrize("value", [[123], [{}], [None], [], ["a", "b"], {"a": 1}, "a"])
+def test_crafted_cursor_is_rejected(value):
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(_cursor(value), str)
+    assert error.value.status_code == 400
+
+
+def test_users_listing_rejects_crafted_cursor(client, admin_headers):
+    response = client.get("/users/", params={"cursor": _cursor([123])}, headers=admin_headers)
+    assert response.status_code == 400, response.text
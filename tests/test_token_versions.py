@@ -0,0 +1,26 @@
+import uuid
+
+from tests.conftest import login, bearer
+
+
+def test_reload_keeps_deleted_users_revoked(client, admin_headers, department_name, create_user):
+    from utilities.token_versions import token_version_map
+
+    user_id, email = create_user(department_name)
+    access_token = login(client, email).json()["access_token"]
+    response = client.delete(f"/users/{user_id}", headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    # listener reconnect reloads versions from users, the deleted user has no row anymore
+    client.portal.call(token_version_map.load)
+    assert token_version_map.is_stale(user_id, 0)
+    assert client.get("/timelog/user-logs", headers=bearer(access_token)).status_code == 401
+
+
+def test_reload_keeps_versions_applied_meanwhile(client):
+    from utilities.token_versions import token_version_map
+
+    user_id = str(uuid.uuid4())
+    token_version_map.apply({"versions": {user_id: 3}})
+    client.portal.call(token_version_map.load)
+    assert token_version_map.current(user_id) == 3
@@ -0,0 +1,30 @@
+import json
+import uuid
+
+from tests.conftest import login, bearer
+
+
+def test_caller_cant_grant_roles_above_own_level(client, department_name, create_role, create_user, role_id):
+    caller_role_id = create_role(20, ["create_user", "import_users"])
+    higher_role_id = create_role(10)
+    _, caller_email = create_user(department_name, roles=[caller_role_id])
+    headers = bearer(login(client, caller_email).json()["access_token"])
+
+    response = client.post("/users/create", json={
+        "firstname": "Test", "lastname": "User", "email": f"test-{uuid.uuid4().hex[:8]}@example.com",
+        "password": "Test@123!", "roles": [higher_role_id], "department_name": department_name,
+    }, headers=headers)
+    assert response.status_code == 403, response.text
+
+    rows = [
+        {"firstname": "Test", "lastname": "User", "email": f"test-{uuid.uuid4().hex[:8]}@example.com",
+         "password": "Test@123!", "roles": [roles], "department_name": department_name}
+        for roles in (higher_role_id, role_id)
+    ]
+    body = "\n".join(json.dumps(row) for row in rows)
+    response = client.post("/users/import", files={"file": ("users.ndjson", body, "application/x-ndjson")},
+                           headers=headers)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["created"] == 1
+    assert [error["row"] for error in report["errors"]] == [1]
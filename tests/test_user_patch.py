@@ -0,0 +1,44 @@
+from tests.conftest import login, bearer
+
+
+def test_patch_clears_department_and_refresh_still_works(client, admin_headers, department_name, create_user):
+    user_id, email = create_user(department_name)
+    tokens = login(client, email).json()
+
+    response = client.patch(f"/users/{user_id}", json={"department_name": None}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["department"] is None
+    assert response.json()["department_name"] is None
+
+    # department is part of the token, so the old access token is revoked but refresh issues a new one
+    response = client.post("/auth/refresh", headers=bearer(tokens["refresh_token"]))
+    assert response.status_code == 201, response.text
+    assert login(client, email).status_code == 201
+
+
+def test_create_user_without_department(client, create_user):
+    _, email = create_user()
+    tokens = login(client, email)
+    assert tokens.status_code == 201, tokens.text
+    response = client.post("/auth/refresh", headers=bearer(tokens.json()["refresh_token"]))
+    assert response.status_code == 201, response.text
+
+
+def test_put_update_keeps_values_sent_empty(client, admin_headers, department_name, create_user):
+    manager_id, _ = create_user(department_name)
+    user_id, email = create_user(department_name)
+
+    response = client.put("/users/update", json={
+        "firstname": "",
+        "lastname": "Renamed",
+        "email": email,
+        "phone": "",
+        "reports_to": manager_id,
+    }, headers=admin_headers)
+    assert response.status_code == 201, response.text
+
+    user = client.get(f"/users/{user_id}", headers=admin_headers).json()
+    assert user["firstname"] == "Test"
+    assert user["lastname"] == "Renamed"
+    # PUT never applied reports_to, that is done with PATCH
+    assert user["reports_to"] is None
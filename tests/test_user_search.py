@@ -0,0 +1,6 @@
+def test_search_needs_three_characters(client, admin_headers):
+    assert client.get("/users/search", params={"q": "ad"}, headers=admin_headers).status_code == 422
+    assert client.get("/users/search", params={"q": " ad "}, headers=admin_headers).status_code == 400
+    response = client.get("/users/search", params={"q": "adm"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert any(user["email"] == "admin@example.com" for user in response.json())
@@ -1,47 +1,35 @@
 from fastapi import HTTPException
-from models.user_model import User
-from repositories.users.users_repository import UserRepository
-from schemas.users_schema import UserResponse
+from utilities.principal import Principal
 
 
-def has_required_permission(user, endpoint_permission: str) -> bool:
-    return endpoint_permission in user.get("permissions", [])
+#permission_mask is the bit of endpoint permission (see permission_bits)
+def has_required_permission(user: Principal, permission_mask: int) -> bool:
+    return user.permission_mask & permission_mask != 0
 
 
 #this can have problem with lower role have access to higher role cross department
-def can_access_cross_department(user: dict) -> bool:
-    return any(ctx.get("can_cross_departments", False) for ctx in user.get("access_context", []))
+def can_access_cross_department(user: Principal) -> bool:
+    return user.can_cross_departments
 
 
-def get_user_min_hierarchy_from_token(user_dict: dict) -> int:
-    access_context = user_dict.get("access_context", [])
-
-    if not access_context:
+def get_user_min_hierarchy_from_token(user: Principal) -> int:
+    if user.min_hierarchy_level is None:
         raise HTTPException(status_code=403, detail="User has no access roles")
 
-    return min(ctx.get("hierarchy_level", 999) for ctx in access_context)
-
+    return user.min_hierarchy_level
 
-def get_user_min_hierarchy_from_db(user_model) -> int:
-    return (
-        min((user_role.role.hierarchy_level for user_role in user_model.roles), default=999)
-    )
 
-def check_department_access(current_user, target_user) -> bool:
-    department = target_user.department
-    if not department or not department.id:
+#target_profile is AccessProfile of the target user (see access_profile_cache)
+def check_department_access(current_user: Principal, target_profile) -> bool:
+    if not target_profile.department_id:
         return False
-    return (
-            current_user.get("department") == department.department_name
-            or can_access_cross_department(current_user)
-    )
+    return current_user.department == target_profile.department_name or current_user.can_cross_departments
 
 
-def check_hierarchy_access(current_user, target_user: User) -> bool:
+def check_hierarchy_access(current_user: Principal, target_profile) -> bool:
     current_level = get_user_min_hierarchy_from_token(current_user)
-    target_level = get_user_min_hierarchy_from_db(target_user)
-    return current_level <= target_level
+    return current_level <= target_profile.min_hierarchy_level
 
 
-def is_god(current_user) -> bool:
-    return any(ctx.get("hierarchy_level", 999) == 0 for ctx in current_user.get("access_context", []))
+def is_god(current_user: Principal) -> bool:
+    return current_user.is_god
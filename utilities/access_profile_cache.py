@@ -0,0 +1,79 @@
+import os
+import uuid
+from typing import NamedTuple, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from configurations.change_events import change_event_bus
+from models.user_model import User, UserRole, Role, Department
+from utilities.cache_utils import TTLCache
+from utilities.rbac_matrix import RBAC_CHANGED_EVENT
+from utilities.token_versions import TOKEN_VERSIONS_EVENT
+
+load_dotenv()
+
+ACCESS_PROFILE_CACHE_TTL_SECONDS = float(os.getenv("ACCESS_PROFILE_CACHE_TTL_SECONDS", "60"))
+ACCESS_PROFILE_CACHE_SIZE = int(os.getenv("ACCESS_PROFILE_CACHE_SIZE", "10000"))
+
+
+class AccessProfile(NamedTuple):
+    # the part of a user needed for department and hierarchy checks on target user
+    department_id: Optional[uuid.UUID]
+    department_name: Optional[str]
+    min_hierarchy_level: int
+    is_active: bool
+
+
+access_profile_cache = TTLCache(ACCESS_PROFILE_CACHE_SIZE, ACCESS_PROFILE_CACHE_TTL_SECONDS)
+
+
+async def get_access_profile(db: AsyncSession, user_id) -> Optional[AccessProfile]:
+    user_id = uuid.UUID(str(user_id))
+    profile = access_profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+
+    min_level = (
+        select(func.min(Role.hierarchy_level))
+        .join(UserRole, UserRole.role_id == Role.id)
+        .where(UserRole.user_id == User.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(Department.id, Department.department_name, func.coalesce(min_level, 999), User.is_active)
+        .select_from(User)
+        .outerjoin(Department, Department.id == User.department_id)
+        .where(User.id == user_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+
+    profile = AccessProfile(*row)
+    access_profile_cache.set(user_id, profile)
+    return profile
+
+
+def invalidate_access_profile(user_id=None) -> None:
+    # without user id every profile is dropped, used when a role or department change can affect many users
+    if user_id is None:
+        access_profile_cache.clear()
+    else:
+        access_profile_cache.invalidate(uuid.UUID(str(user_id)))
+
+
+def _on_token_versions(payload: dict) -> None:
+    # roles, department and status changes bump token version, so the event also drops profiles on other workers
+    for user_id in payload.get("versions", {}):
+        invalidate_access_profile(user_id)
+
+
+def _on_rbac_changed(payload: dict) -> None:
+    # role level edits and role deletes change min_hierarchy_level of every user holding the role
+    invalidate_access_profile()
+
+
+change_event_bus.subscribe(TOKEN_VERSIONS_EVENT, _on_token_versions)
+change_event_bus.subscribe(RBAC_CHANGED_EVENT, _on_rbac_changed)
@@ -1,3 +1,5 @@
+import hashlib
+import time
 from datetime import timedelta, datetime
 from typing import Optional
 from fastapi import Depends, HTTPException
@@ -10,6 +12,10 @@ import os
 
 from starlette import status
 
+from utilities.cache_utils import TTLCache
+from utilities.token_versions import token_version_map
+from utilities.principal import Principal
+
 # Load environment variables
 load_dotenv()
 
@@ -21,6 +27,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = float(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15
 REFRESH_TOKEN_EXPIRE_MINUTES = float(os.getenv("REFRESH_TOKEN_EXPIRE_HOURS", "1440"))
 JWT_ACCESS_SECRET = os.getenv("JWT_ACCESS_SECRET")
 JWT_REFRESH_SECRET = os.getenv("JWT_REFRESH_SECRET")
+TOKEN_CLAIMS_CACHE_SIZE = int(os.getenv("TOKEN_CLAIMS_CACHE_SIZE", "10000"))
 
 # Validate secrets
 if not JWT_ACCESS_SECRET or not JWT_REFRESH_SECRET:
@@ -31,6 +38,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 oauth2_refresh_scheme = OAuth2PasswordBearer(tokenUrl="/auth/refresh")
 
+# principal built from verified access tokens, entry lives until token's exp so expired token is never served from it
+token_claims_cache = TTLCache(TOKEN_CLAIMS_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 
 # Password hashing functions
 def get_password_hash(plain_password: str) -> str:
@@ -57,15 +67,42 @@ def create_refresh_token(data: dict) -> str:
 
 
 # Token verification functions
-def verify_access_token(token: str = Depends(oauth2_scheme)) -> Optional[dict]:
+def verify_access_token(token: str = Depends(oauth2_scheme)) -> Principal:
+    #key is digest of whole token, so a token with altered claims or signature never matches a cached entry
+    cache_key = hashlib.sha256(token.encode()).digest()
+    principal = token_claims_cache.get(cache_key)
+    if principal is not None:
+        if not principal.is_current:
+            # roles or permissions changed since it was built, claims are already verified
+            principal = _cache_principal(cache_key, Principal(principal.claims))
+        return _check_token_version(principal)
     try:
         payload = jwt.decode(token, JWT_ACCESS_SECRET, algorithms=[ALGORITHM])
-        return payload
     except ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+    # only verified tokens are cached, principal is built once per token
+    principal = _cache_principal(cache_key, Principal(payload))
+    return _check_token_version(principal)
+
+
+def _cache_principal(cache_key: bytes, principal: Principal) -> Principal:
+    # exp is wall clock, cache expiry is monotonic
+    claims = principal.claims
+    remaining = claims["exp"] - time.time() if "exp" in claims else token_claims_cache.ttl_seconds
+    if remaining > 0:
+        token_claims_cache.set(cache_key, principal, expires_at=time.monotonic() + remaining)
+    return principal
+
+
+def _check_token_version(principal: Principal) -> Principal:
+    # roles, department or status of user changed after token was issued. In-memory check, no query
+    if token_version_map.is_stale(principal.user_id, principal.token_version):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    return principal
+
 
 def verify_refresh_token(token: str) -> Optional[dict]:
     try:
@@ -77,40 +114,25 @@ def verify_refresh_token(token: str) -> Optional[dict]:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
 
+def _access_token_claims(user) -> dict:
+    # roles are carried as ids only, their levels and permissions are evaluated from rbac matrix (see principal)
+    return {
+        "sub": str(user.id),
+        "role_ids": [str(r["id"]) for r in user.roles],
+        "department": user.department_name or None,
+        "reports_to": str(user.reports_to) if user.reports_to else None,
+        "timezone": user.timezone if hasattr(user, "timezone") else os.getenv("DEFAULT_TIMEZONE"),
+        "ver": user.token_version if hasattr(user, "token_version") else 0
+    }
+
+
 def generate_tokens(user):
 
     roles = user.roles
     if not roles:
         raise HTTPException(status_code=400, detail="User has no assigned roles")
 
-    access_context = [
-        {
-            "role": r["name"],
-            "hierarchy_level": r["hierarchy_level"],
-            "can_cross_departments": r["can_cross_departments"]
-        }
-        for r in roles
-    ]
-
-    min_level = min(r["hierarchy_level"] for r in access_context)
-    can_cross = any(
-        r["hierarchy_level"] == min_level and r["can_cross_departments"]
-        for r in access_context
-    )
-
-    access_token = create_access_token(
-        {
-            "sub": str(user.id),
-            "roles": [r["name"] for r in roles],
-            "permissions": user.permissions if hasattr(user, "permissions") else [],
-            "access_context": access_context,
-            "hierarchy_level": min_level,
-            "can_cross_departments": can_cross,
-            "department": user.department_name or None,
-            "reports_to": str(user.reports_to) if user.reports_to else None,
-            "timezone": user.timezone if hasattr(user, "timezone") else os.getenv("DEFAULT_TIMEZONE")
-        }
-    )
+    access_token = create_access_token(_access_token_claims(user))
 
     refresh_token = create_refresh_token({"sub": str(user.id)})
 
@@ -122,35 +144,7 @@ def generate_tokens(user):
 
 
 def generate_access_token(user):
-    roles = user.roles
-    access_context = [
-        {
-            "role": r["name"],
-            "hierarchy_level": r["hierarchy_level"],
-            "can_cross_departments": r["can_cross_departments"]
-        }
-        for r in roles
-    ]
-
-    min_level = min(r["hierarchy_level"] for r in access_context)
-    can_cross = any(
-        r["hierarchy_level"] == min_level and r["can_cross_departments"]
-        for r in access_context
-    )
-
-    access_token = create_access_token(
-        {
-            "sub": str(user.id),
-            "roles": [r["name"] for r in roles],
-            "permissions": user.permissions if hasattr(user, "permissions") else [],
-            "access_context": access_context,
-            "hierarchy_level": min_level,
-            "can_cross_departments": can_cross,
-            "department": user.department_name or None,
-            "reports_to": str(user.reports_to) if user.reports_to else None,
-            "timezone": user.timezone if hasattr(user, "timezone") else os.getenv("DEFAULT_TIMEZONE")
-        }
-    )
+    access_token = create_access_token(_access_token_claims(user))
 
     return {
         "access_token": access_token,
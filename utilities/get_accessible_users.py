@@ -1,25 +1,54 @@
-from sqlalchemy.orm import Session
-from typing import List, Type, Any
-from models.user_model import User
-from utilities.access_control_utils import is_god, check_hierarchy_access, check_department_access
+from sqlalchemy import select, and_, or_, exists, Select
+from models.user_model import User, UserRole, Role, Department, UserHierarchy
+from utilities.principal import Principal
+from utilities.access_control_utils import is_god, can_access_cross_department, get_user_min_hierarchy_from_token
 
-def get_accessible_users(db: Session, current_user: User) -> list[Type[User]]:
 
-    # If the user has the god role, return all users
+def accessible_users_filter(current_user: Principal):
+    """
+    Where clause on User for users the current user can access. Same rule as check_department_access and
+    check_hierarchy_access but evaluated by database, so it can be joined by any query instead of loading users.
+    """
+    # If the user has the god role, every user is accessible
     if is_god(current_user):
-        return db.query(User).all()
+        return User.id.isnot(None)
 
-    all_users = db.query(User).filter(User.is_active.is_(True)).all()
-    accessible_users = []
+    current_level = get_user_min_hierarchy_from_token(current_user)
 
-    for user in all_users:
-        if user.id == current_user.get('sub'):
-            accessible_users.append(user)
-            continue
+    if can_access_cross_department(current_user):
+        department_clause = User.department_id.isnot(None)
+    else:
+        department_clause = User.department_id == (
+            select(Department.id)
+            .where(Department.department_name == current_user.department)
+            .scalar_subquery()
+        )
 
-        #hierarchy access won't work and also department need to work further
+    # target min hierarchy >= current level means target has no role higher than current user
+    higher_role_exists = exists().where(
+        UserRole.user_id == User.id,
+        UserRole.role_id == Role.id,
+        Role.hierarchy_level < current_level
+    )
 
-        if check_department_access(current_user, user) and check_hierarchy_access(current_user, user):
-            accessible_users.append(user)
+    return or_(
+        User.id == current_user.user_id,
+        and_(
+            User.is_active.is_(True),
+            department_clause,
+            ~higher_role_exists
+        )
+    )
 
-    return accessible_users
+
+def accessible_user_ids_query(current_user: Principal) -> Select:
+    # use as subquery e.g. Model.user_id.in_(accessible_user_ids_query(current_user))
+    return select(User.id).where(accessible_users_filter(current_user))
+
+
+def reporting_user_ids_query(manager_id, direct_only: bool = False) -> Select:
+    # direct and indirect reports of the manager, single indexed lookup on user_hierarchy closure table
+    query = select(UserHierarchy.descendant_id).where(UserHierarchy.ancestor_id == manager_id)
+    if direct_only:
+        return query.where(UserHierarchy.depth == 1)
+    return query.where(UserHierarchy.depth > 0)
@@ -0,0 +1,75 @@
+import asyncio
+import codecs
+import csv
+import json
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+IMPORT_FORMATS = ("csv", "ndjson")
+#separator of multiple values (roles) inside one csv cell
+CSV_LIST_SEPARATOR = ";"
+
+
+def detect_import_format(file: UploadFile, import_format: Optional[str] = None) -> str:
+    if import_format is None:
+        filename = (file.filename or "").lower()
+        content_type = (file.content_type or "").lower()
+        if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+            import_format = "ndjson"
+        elif filename.endswith(".csv") or "csv" in content_type:
+            import_format = "csv"
+    if import_format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format, use one of {', '.join(IMPORT_FORMATS)}")
+    return import_format
+
+
+def _text_lines(file: UploadFile) -> Iterator[str]:
+    # upload is already spooled by starlette, decoded line by line so a big file is never held in memory as one string.
+    # Reads are blocking, rows are consumed through next_import_batch which runs them in a thread
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    for chunk in iter(lambda: file.file.read(64 * 1024), b""):
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        yield from (line + "\n" for line in lines)
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+def _csv_rows(file: UploadFile) -> Iterator[Tuple[int, dict]]:
+    reader = csv.DictReader(_text_lines(file))
+    for row_number, row in enumerate(reader, start=1):
+        # empty cells are missing values, not empty strings
+        row = {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+        if "roles" in row:
+            row["roles"] = [role.strip() for role in row["roles"].split(CSV_LIST_SEPARATOR) if role.strip()]
+        yield row_number, row
+
+
+def _ndjson_rows(file: UploadFile) -> Iterator[Tuple[int, Optional[dict]]]:
+    row_number = 0
+    for line in _text_lines(file):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        # None marks a line that is not a json object, it is reported for that row instead of failing the whole import
+        yield row_number, row if isinstance(row, dict) else None
+
+
+def iter_import_rows(file: UploadFile, import_format: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """(row number, raw row) of uploaded file, rows are parsed lazily as they are consumed"""
+    if import_format == "csv":
+        return _csv_rows(file)
+    return _ndjson_rows(file)
+
+
+async def next_import_batch(rows: Iterator[Tuple[int, Optional[dict]]], size: int) -> List[Tuple[int, Optional[dict]]]:
+    # reading and parsing the spooled file blocks, it runs in a thread so the event loop keeps serving requests
+    return await asyncio.to_thread(lambda: list(islice(rows, size)))
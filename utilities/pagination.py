@@ -0,0 +1,21 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+
+#keyset cursor is the sort key of last row of previous page, opaque to clients
+def encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).rstrip(b"=").decode()
+
+
+#types are the expected type of each sort key value, a crafted cursor must not reach the query
+def decode_cursor(cursor: str, *types: type):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(isinstance(value, value_type) for value, value_type in zip(values, types))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values[0] if len(values) == 1 else values
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from starlette import status
+
+from utilities.auth_utlis import get_password_hash, verify_password
+
+load_dotenv()
+
+#threads doing bcrypt per worker, this is the cpu budget a login storm can take from the worker
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+#hash/verify calls allowed to wait for a thread, further calls are rejected with 503 instead of piling up
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hash/verify on its own size limited thread pool, so it never blocks the event loop
+    and doesn't take threads of the default pool used by starlette for sync dependencies.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    def _acquire_slot(self, reserved: bool = False):
+        with self._lock:
+            #reserved calls already hold capacity taken for their whole batch, they are never rejected
+            if not reserved and self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, try again",
+                    headers={"Retry-After": "1"}
+                )
+            self.queued += 1
+
+    def _run(self, func, args, submitted_at: float):
+        started = time.perf_counter()
+        waited = started - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.queue_seconds_total += waited
+            self.queue_seconds_max = max(self.queue_seconds_max, waited)
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.run_seconds_total += time.perf_counter() - started
+
+    async def _submit(self, func, *args, reserved: bool = False):
+        self._acquire_slot(reserved)
+        future = self._executor.submit(self._run, func, args, time.perf_counter())
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, plain_password: str) -> str:
+        return await self._submit(get_password_hash, plain_password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, plain_password, hashed_password)
+
+    async def hash_many(self, plain_passwords: list[str]) -> list[str]:
+        """
+        Batch takes at most half of the queue once, for its whole run, and its hashes are never rejected with 503,
+        so a login storm can't abort a bulk import midway. Logins arriving meanwhile still get the other half.
+        """
+        semaphore = asyncio.Semaphore(max(1, self.max_queue // 2))
+
+        async def _hash(plain_password):
+            async with semaphore:
+                return await self._submit(get_password_hash, plain_password, reserved=True)
+
+        return await asyncio.gather(*[_hash(plain_password) for plain_password in plain_passwords])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_seconds_avg": round(self.queue_seconds_total / self.completed, 6) if self.completed else 0.0,
+                "queue_seconds_max": round(self.queue_seconds_max, 6),
+                "run_seconds_avg": round(self.run_seconds_total / self.completed, 6) if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+
+async def hash_password_async(plain_password: str) -> str:
+    return await password_hasher.hash(plain_password)
+
+
+async def hash_passwords_async(plain_passwords: list[str]) -> list[str]:
+    return await password_hasher.hash_many(plain_passwords)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
@@ -0,0 +1,31 @@
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user_model import Permission
+
+
+class PermissionBitTable:
+    """
+    Permission name -> bit position, loaded from permissions.bit at startup.
+    Bits are assigned once when a permission is synced and never change, so role masks built from them
+    (see rbac_matrix) stay valid.
+    """
+
+    def __init__(self):
+        self.bits: Dict[str, int] = {}
+
+    async def load(self, db: AsyncSession) -> None:
+        result = await db.execute(select(Permission.name, Permission.bit))
+        self.bits = dict(result.all())
+
+    def mask_for(self, permission: str) -> Optional[int]:
+        bit = self.bits.get(permission)
+        return None if bit is None else 1 << bit
+
+    def names(self, mask: int) -> set:
+        return {name for name, bit in self.bits.items() if mask >> bit & 1}
+
+
+permission_bit_table = PermissionBitTable()
@@ -1,74 +1,113 @@
 # permissions.py
 from fastapi import Depends, HTTPException, Request
-from typing import Callable, Dict, Set
+from fastapi.routing import APIRoute
+from starlette.routing import BaseRoute
+from typing import Callable, Dict, Set, NamedTuple, Optional, Iterable
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from configurations.database import get_db
-from models.user_model import User
-from repositories.users.users_repository import UserRepository
+from configurations.database import get_async_db
 from utilities.access_control_utils import has_required_permission, check_department_access, check_hierarchy_access, \
     is_god
 from utilities.auth_utlis import verify_access_token
+from utilities.access_profile_cache import get_access_profile
+from utilities.permission_bits import permission_bit_table
+from utilities.principal import Principal
 
-# Registry to track which endpoints use which permissions
+#attribute register_permission sets on endpoint function
+PERMISSION_ATTRIBUTE = "__required_permission__"
+#path parameter holding the user a route acts on, department and hierarchy checks apply to it
+TARGET_USER_PARAM = "user_id"
+
+# Registry to track which endpoints use which permissions, "METHOD path" -> permission. Filled when routes are compiled
 permission_registry: Dict[str, str] = {}
 all_registered_permissions: Set[str] = set()
 
 
-# Register a permission with an endpoint
+class PermissionRequirement(NamedTuple):
+    # compiled onto each APIRoute at startup and read by enforce_permissions_dependency
+    permission: Optional[str]
+    mask: Optional[int]
+    target_user_param: Optional[str]
+
+
+# Register a permission with an endpoint. Stored on the function itself, so endpoints with same name don't collide
 def register_permission(permission: str):
     def decorator(func: Callable):
         final_permission = permission or func.__name__
-        permission_registry[func.__name__] = final_permission
+        setattr(func, PERMISSION_ATTRIBUTE, final_permission)
         all_registered_permissions.add(final_permission)
         return func
 
     return decorator
 
 
-# Query all permissions for the user from their roles
-def get_user_permissions(user: User) -> Set[str]:
-    permissions = set()
-    for resource in user.get("permissions"):
-        permissions.add(resource)
-    return permissions
+def compile_route_requirement(route: APIRoute) -> PermissionRequirement:
+    permission = getattr(route.endpoint, PERMISSION_ATTRIBUTE, None)
+    requirement = PermissionRequirement(
+        permission=permission,
+        mask=permission_bit_table.mask_for(permission) if permission else None,
+        target_user_param=TARGET_USER_PARAM if TARGET_USER_PARAM in route.param_convertors else None
+    )
+    route.permission_requirement = requirement
+    if permission:
+        for method in sorted(route.methods):
+            permission_registry[f"{method} {route.path}"] = permission
+    return requirement
+
+
+# Load permission bits and compile requirement of every route. Called at startup
+async def compile_route_permissions(db: AsyncSession, routes: Iterable[BaseRoute]):
+    await permission_bit_table.load(db)
+    for route in routes:
+        if isinstance(route, APIRoute):
+            compile_route_requirement(route)
+
+
+# Permissions of the user from their roles, decoded once when principal is built from token
+def get_user_permissions(user: Principal) -> Set[str]:
+    return user.permissions
 
 
 # Main permission enforcement dependency
-def enforce_permissions_dependency(
+async def enforce_permissions_dependency(
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(verify_access_token),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(verify_access_token),
 ):
 
     #user with role 0 has access to everything
     if is_god(current_user):
         return current_user
 
-    endpoint_func = request.scope.get("endpoint")
-    func_name = endpoint_func.__name__ if endpoint_func else None
-
-    if func_name:
-        endpoint_permission = permission_registry.get(func_name)
-        if endpoint_permission and not has_required_permission(current_user, endpoint_permission):
+    route = request.scope.get("route")
+    requirement = getattr(route, "permission_requirement", None)
+    if requirement is None:
+        requirement = compile_route_requirement(route)
+
+    if requirement.permission:
+        # bit of permission unknown to this worker yet (synced by another worker), reload it
+        if requirement.mask is None:
+            await permission_bit_table.load(db)
+            requirement = compile_route_requirement(route)
+        if not requirement.mask or not has_required_permission(current_user, requirement.mask):
             raise HTTPException(status_code=403, detail="Permission denied")
 
     # Check if the route targets a specific user
-    target_user_id = request.path_params.get("user_id")
+    target_user_id = request.path_params.get(requirement.target_user_param) if requirement.target_user_param else None
 
     if target_user_id:
-        user_repo = UserRepository(db)
-        target_user = user_repo.get_user_by_id(target_user_id)
-        if not target_user:
+        # cached department and hierarchy level of target user, avoids loading user with roles on every request
+        target_profile = await get_access_profile(db, target_user_id)
+        if not target_profile:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Department-level access
-        if not check_department_access(current_user, target_user):
+        if not check_department_access(current_user, target_profile):
             raise HTTPException(status_code=403, detail="Cross-department access denied")
 
         # Hierarchy-level access
-        if not check_hierarchy_access(current_user, target_user):
+        if not check_hierarchy_access(current_user, target_profile):
             raise HTTPException(status_code=403, detail="Insufficient role hierarchy")
 
     return current_user
@@ -0,0 +1,49 @@
+from typing import Optional
+
+from utilities.permission_bits import permission_bit_table
+from utilities.rbac_matrix import rbac_matrix
+
+
+class Principal:
+    """
+    Caller of a request, built once from verified access token claims (and cached with them).
+    Token carries role ids only, levels and permissions come from the in-memory rbac matrix, so
+    principal is rebuilt when matrix version changes. Access checks are attribute reads.
+    """
+
+    __slots__ = (
+        "claims", "rbac_version", "user_id", "role_ids", "roles", "department", "timezone", "reports_to",
+        "min_hierarchy_level", "is_god", "can_cross_departments", "permission_mask", "permissions", "token_version"
+    )
+
+    def __init__(self, claims: dict):
+        self.claims = claims
+        self.rbac_version = rbac_matrix.version
+        self.role_ids: tuple = tuple(claims.get("role_ids") or ())
+        # roles deleted after token was issued are ignored
+        roles = [role for role in (rbac_matrix.roles.get(role_id) for role_id in self.role_ids) if role is not None]
+        levels = [role.hierarchy_level for role in roles]
+        permission_mask = 0
+        for role in roles:
+            permission_mask |= role.permission_mask
+
+        self.user_id: str = claims.get("sub")
+        self.roles: tuple = tuple(role.name for role in roles)
+        self.department: Optional[str] = claims.get("department")
+        self.timezone: Optional[str] = claims.get("timezone")
+        self.reports_to: Optional[str] = claims.get("reports_to")
+        #None when user has no roles, access checks reject such user
+        self.min_hierarchy_level: Optional[int] = min(levels) if levels else None
+        self.is_god: bool = 0 in levels
+        self.can_cross_departments: bool = any(role.can_cross_departments for role in roles)
+        self.permission_mask: int = permission_mask
+        self.permissions: frozenset = frozenset(permission_bit_table.names(permission_mask))
+        self.token_version: int = claims.get("ver", 0)
+
+    @property
+    def is_current(self) -> bool:
+        # False once roles or permissions were reloaded after this principal was built
+        return self.rbac_version == rbac_matrix.version
+
+    def __repr__(self):
+        return f"Principal(user_id={self.user_id!r}, roles={self.roles!r}, department={self.department!r})"
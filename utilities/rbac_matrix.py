@@ -0,0 +1,69 @@
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from configurations.change_events import change_event_bus
+from configurations.database import AsyncSessionLocal
+from models.user_model import Role, Permission, role_permissions
+from utilities.permission_bits import permission_bit_table
+
+RBAC_CHANGED_EVENT = "rbac_changed"
+
+
+class RoleEntry(NamedTuple):
+    name: str
+    hierarchy_level: int
+    can_cross_departments: bool
+    #bits of the role's permissions (see permission_bits)
+    permission_mask: int
+
+
+class RbacMatrix:
+    """
+    role id -> level, cross department flag and permission mask, per worker. Tokens carry role ids only and
+    principal is evaluated against this, so role and permission edits apply to existing tokens immediately.
+    Reloaded on rbac_changed events, version changes on every load.
+    """
+
+    def __init__(self):
+        self.roles: dict[str, RoleEntry] = {}
+        self.version = 0
+
+    async def load(self, db: Optional[AsyncSession] = None):
+        if db is None:
+            async with AsyncSessionLocal() as db:
+                return await self.load(db)
+
+        # bits of newly synced permissions are needed to build the masks
+        await permission_bit_table.load(db)
+        result = await db.execute(
+            select(
+                Role.id, Role.name, Role.hierarchy_level, Role.can_cross_departments,
+                func.array_remove(func.array_agg(Permission.bit), None)
+            )
+            .outerjoin(role_permissions, role_permissions.c.role_id == Role.id)
+            .outerjoin(Permission, Permission.id == role_permissions.c.permission_id)
+            .group_by(Role.id)
+        )
+        roles = {}
+        for role_id, name, hierarchy_level, can_cross_departments, bits in result.all():
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            roles[str(role_id)] = RoleEntry(name, hierarchy_level, bool(can_cross_departments), mask)
+        self.roles = roles
+        self.version += 1
+
+    def on_change(self, payload: dict):
+        return self.load()
+
+
+rbac_matrix = RbacMatrix()
+change_event_bus.subscribe(RBAC_CHANGED_EVENT, rbac_matrix.on_change)
+change_event_bus.on_connect(rbac_matrix.load)
+
+
+async def publish_rbac_changed(db: AsyncSession):
+    # every worker reloads the matrix once caller's transaction commits
+    await change_event_bus.publish(db, RBAC_CHANGED_EVENT, {})
@@ -0,0 +1,13 @@
+from typing import Iterable
+
+from sqlalchemy import bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+
+
+def uuid_array(ids: Iterable):
+    # single array parameter instead of one bind parameter per id, use with any_() to keep large id lists in one statement
+    return bindparam(None, list(ids), type_=ARRAY(UUID(as_uuid=True)))
+
+
+def string_array(values: Iterable):
+    return bindparam(None, list(values), type_=ARRAY(String))
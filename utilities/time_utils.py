@@ -1,4 +1,6 @@
-from datetime import datetime
+from datetime import datetime, date
+
+import pytz
 
 # Utility: Get current quarter
 def get_current_quarter(date: datetime) -> int:
@@ -6,4 +8,8 @@ def get_current_quarter(date: datetime) -> int:
 
 # Utility: Calculate number of leave days
 def calculate_days(from_date: datetime, to_date: datetime) -> int:
-    return (to_date - from_date).days + 1
\ No newline at end of file
+    return (to_date - from_date).days + 1
+
+# Utility: local day of a stored time. Times are stored as naive utc, days are counted in user's timezone
+def local_date(utc_time: datetime, timezone: str) -> date:
+    return pytz.utc.localize(utc_time).astimezone(pytz.timezone(timezone)).date()
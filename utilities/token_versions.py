@@ -0,0 +1,86 @@
+import sys
+import threading
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from configurations.change_events import change_event_bus
+from configurations.database import AsyncSessionLocal
+from models.user_model import User
+
+TOKEN_VERSIONS_EVENT = "token_versions"
+#version of deleted users, every token of them is stale
+REVOKED_VERSION = sys.maxsize
+
+
+class TokenVersionMap:
+    """
+    Current token_version of users, per worker. Only users with version > 0 are kept, token of any other
+    user is current. Kept in sync by token_versions change events so checking a token needs no query.
+    """
+
+    def __init__(self):
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def load(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(User.id, User.token_version).where(User.token_version > 0))
+            versions = {str(user_id): version for user_id, version in result.all()}
+        with self._lock:
+            # merged, not replaced: deleted users have no row to load, their revocation is only known from events.
+            # Versions applied while loading are kept too, they only move forward
+            for user_id, version in self._versions.items():
+                if version > versions.get(user_id, 0):
+                    versions[user_id] = version
+            self._versions = versions
+
+    def apply(self, payload: dict):
+        # versions only move forward, so an event received twice or out of order is harmless
+        with self._lock:
+            for user_id, version in payload.get("versions", {}).items():
+                version = REVOKED_VERSION if version is None else version
+                if version > self._versions.get(user_id, 0):
+                    self._versions[user_id] = version
+
+    def current(self, user_id: Optional[str]) -> int:
+        return self._versions.get(user_id, 0)
+
+    def is_stale(self, user_id: Optional[str], token_version: int) -> bool:
+        return token_version < self.current(user_id)
+
+    def stats(self) -> dict:
+        return {"size": len(self._versions)}
+
+
+token_version_map = TokenVersionMap()
+change_event_bus.subscribe(TOKEN_VERSIONS_EVENT, token_version_map.apply)
+change_event_bus.on_connect(token_version_map.load)
+
+
+async def publish_token_versions(db: AsyncSession, versions: dict):
+    await change_event_bus.publish_chunked(
+        db, TOKEN_VERSIONS_EVENT, list(versions.items()), lambda chunk: {"versions": dict(chunk)}
+    )
+
+
+async def bump_token_versions(db: AsyncSession, user_ids) -> int:
+    """
+    Increment token_version of given users (list or select of ids) so their current tokens are rejected.
+    Runs in caller's transaction, workers are notified when it commits.
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(token_version=User.token_version + 1)
+        .returning(User.id, User.token_version)
+        .execution_options(synchronize_session=False)
+    )
+    versions = {str(user_id): version for user_id, version in result.all()}
+    await publish_token_versions(db, versions)
+    return len(versions)
+
+
+async def revoke_deleted_user_tokens(db: AsyncSession, user_id):
+    await publish_token_versions(db, {str(user_id): None})
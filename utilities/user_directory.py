@@ -0,0 +1,116 @@
+import uuid
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import select, any_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from configurations.change_events import change_event_bus
+from configurations.database import AsyncSessionLocal
+from models.user_model import User, Department
+from utilities.sql_utils import uuid_array
+
+USER_DIRECTORY_EVENT = "user_directory"
+
+
+class DirectoryEntry(NamedTuple):
+    id: uuid.UUID
+    firstname: str
+    lastname: str
+    department_id: Optional[uuid.UUID]
+    department_name: Optional[str]
+    reports_to: Optional[uuid.UUID]
+    is_active: bool
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.firstname} {self.lastname}"
+
+
+class UserDirectory:
+    """
+    user id -> name, department, manager and active flag, per worker. Used to render users in responses
+    (active status, leave lists) without querying users. Loaded when change event listener connects and
+    refreshed for the users named in user_directory events, which are published by every user write.
+    """
+
+    def __init__(self):
+        self._entries: dict[uuid.UUID, DirectoryEntry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _query():
+        return (
+            select(User.id, User.firstname, User.lastname, User.department_id, Department.department_name,
+                   User.reports_to, User.is_active)
+            .outerjoin(Department, Department.id == User.department_id)
+        )
+
+    async def load(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(self._query())
+            entries = {row[0]: DirectoryEntry(*row) for row in result.all()}
+        self._entries = entries
+
+    async def refresh(self, user_ids: Iterable, db: Optional[AsyncSession] = None) -> dict:
+        # reload given users, ones that no longer exist are dropped
+        user_ids = {uuid.UUID(str(user_id)) for user_id in user_ids}
+        if not user_ids:
+            return {}
+        if db is None:
+            async with AsyncSessionLocal() as db:
+                return await self.refresh(user_ids, db)
+
+        result = await db.execute(self._query().where(User.id == any_(uuid_array(user_ids))))
+        entries = {row[0]: DirectoryEntry(*row) for row in result.all()}
+        for user_id in user_ids - entries.keys():
+            self._entries.pop(user_id, None)
+        self._entries.update(entries)
+        return entries
+
+    def on_change(self, payload: dict):
+        # no user ids means everything is reloaded
+        user_ids = payload.get("user_ids")
+        if user_ids is None:
+            return self.load()
+        return self.refresh(user_ids)
+
+    def get(self, user_id) -> Optional[DirectoryEntry]:
+        return self._entries.get(uuid.UUID(str(user_id)))
+
+    async def get_many(self, user_ids: Iterable, db: Optional[AsyncSession] = None) -> dict[uuid.UUID, DirectoryEntry]:
+        """
+        Batch lookup. Users not in the directory yet (created on another worker a moment ago) are
+        loaded with one query when db is given.
+        """
+        found = {}
+        missing = set()
+        for user_id in user_ids:
+            user_id = uuid.UUID(str(user_id))
+            entry = self._entries.get(user_id)
+            if entry is None:
+                missing.add(user_id)
+            else:
+                found[user_id] = entry
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing and db is not None:
+            found.update(await self.refresh(missing, db))
+        return found
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_directory = UserDirectory()
+change_event_bus.subscribe(USER_DIRECTORY_EVENT, user_directory.on_change)
+change_event_bus.on_connect(user_directory.load)
+
+
+async def publish_users_changed(db: AsyncSession, user_ids: Optional[Iterable] = None):
+    """Every worker reloads these users (all users when None) once caller's transaction commits"""
+    if user_ids is None:
+        await change_event_bus.publish(db, USER_DIRECTORY_EVENT, {})
+        return
+    user_ids = [str(user_id) for user_id in dict.fromkeys(user_ids)]
+    await change_event_bus.publish_chunked(db, USER_DIRECTORY_EVENT, user_ids, lambda chunk: {"user_ids": chunk})